@@ -0,0 +1,83 @@
+from __future__ import annotations
+
+import json
+from typing import AsyncIterator, Sequence
+
+import pyarrow as pa
+
+ARROW_STREAM_MEDIA_TYPE = "application/vnd.apache.arrow.stream"
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+
+
+class ChunkSink:
+    # Write-only file object for pyarrow writers whose output is streamed out
+    # piece by piece instead of being buffered whole.
+    def __init__(self):
+        self.closed = False
+        self._chunks: list[bytes] = []
+        self._position = 0
+
+    def write(self, data) -> int:
+        chunk = bytes(data)
+        self._chunks.append(chunk)
+        self._position += len(chunk)
+        return len(chunk)
+
+    def tell(self) -> int:
+        return self._position
+
+    def flush(self) -> None:
+        pass
+
+    def close(self) -> None:
+        self.closed = True
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def arrow_record_batch(schema: pa.Schema, rows: Sequence) -> pa.RecordBatch:
+    # Records are transposed straight into columns; no per-row dicts are built.
+    columns = list(zip(*rows)) if rows else [() for _ in schema]
+    arrays = []
+    for field, values in zip(schema, columns):
+        if pa.types.is_dictionary(field.type):
+            arrays.append(
+                pa.array(values, type=field.type.value_type).dictionary_encode().cast(field.type)
+            )
+        else:
+            arrays.append(pa.array(values, type=field.type))
+    return pa.RecordBatch.from_arrays(arrays, schema=schema)
+
+
+def arrow_stream_bytes(schema: pa.Schema, rows: Sequence) -> bytes:
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, schema) as writer:
+        writer.write_batch(arrow_record_batch(schema, rows))
+    return sink.getvalue().to_pybytes()
+
+
+async def arrow_stream_chunks(
+    schema: pa.Schema,
+    batches: AsyncIterator[Sequence],
+) -> AsyncIterator[bytes]:
+    sink = ChunkSink()
+    with pa.ipc.new_stream(sink, schema) as writer:
+        yield sink.drain()
+        async for rows in batches:
+            writer.write_batch(arrow_record_batch(schema, rows))
+            yield sink.drain()
+    yield sink.drain()
+
+
+def ndjson_bytes(names: Sequence[str], rows: Sequence) -> bytes:
+    return "".join(
+        f"{json.dumps(dict(zip(names, row)), separators=(',', ':'))}\n" for row in rows
+    ).encode("utf-8")
+
+
+async def ndjson_chunks(names: Sequence[str], batches: AsyncIterator[Sequence]) -> AsyncIterator[bytes]:
+    async for rows in batches:
+        yield ndjson_bytes(names, rows)
@@ -50,6 +50,10 @@ class Settings:
         os.getenv("RASTER_TILES_DIR"),
         BASE_DIR / "data" / "raster_tiles",
     )
+    mbtiles_reader_threads: int = int(os.getenv("MBTILES_READER_THREADS", "8"))
+    tile_cache_mb: int = int(os.getenv("TILE_CACHE_MB", "256"))
+    tile_brotli_quality: int = int(os.getenv("TILE_BROTLI_QUALITY", "7"))
+    detail_cache_mb: int = int(os.getenv("DETAIL_CACHE_MB", "64"))
 
     mlflow_tracking_uri: str = (
         os.getenv("MLFLOW_TRACKING_URI")
@@ -58,6 +62,16 @@ class Settings:
         else f"http://{_default_service_host()}:5001"
     )
     mlflow_experiment: str = os.getenv("MLFLOW_EXPERIMENT", "insar_anomaly_local_v1")
+    ml_tile_bake_min_zoom: int = int(os.getenv("ML_TILE_BAKE_MIN_ZOOM", "0"))
+    ml_tile_bake_max_zoom: int = int(os.getenv("ML_TILE_BAKE_MAX_ZOOM", "16"))
+    ml_tile_bake_concurrency: int = int(os.getenv("ML_TILE_BAKE_CONCURRENCY", "2"))
+    ml_tile_aggregate_max_zoom: int = int(os.getenv("ML_TILE_AGGREGATE_MAX_ZOOM", "12"))
+    ml_tile_aggregate_cells: int = int(os.getenv("ML_TILE_AGGREGATE_CELLS", "64"))
+    ml_tile_cache_path: Path = _resolve_dir(
+        os.getenv("ML_TILE_CACHE_PATH"),
+        BASE_DIR / "data" / "ml_tile_cache.sqlite",
+    )
+    ml_tile_cache_disk_mb: int = int(os.getenv("ML_TILE_CACHE_DISK_MB", "1024"))
 
     @property
     def db_dsn(self) -> str:
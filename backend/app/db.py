@@ -26,6 +26,21 @@ async def fetch_all(app: FastAPI, query: str, *args):
         return await conn.fetch(query, *args)
 
 
+async def iter_batches(
+    app: FastAPI,
+    query: str,
+    *args,
+    batch_size: int = 5000,
+    isolation: str | None = None,
+):
+    # Server-side cursor: memory stays bounded by batch_size however many rows match.
+    async with app.state.db_pool.acquire() as conn:
+        async with conn.transaction(isolation=isolation, readonly=True):
+            cursor = await conn.cursor(query, *args)
+            while rows := await cursor.fetch(batch_size):
+                yield rows
+
+
 async def execute(app: FastAPI, query: str, *args) -> str:
     async with app.state.db_pool.acquire() as conn:
         return await conn.execute(query, *args)
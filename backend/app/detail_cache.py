@@ -0,0 +1,153 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+from contextlib import suppress
+from typing import Any, Hashable
+
+import asyncpg
+from fastapi import Response
+
+from .tilestore.cache import MISSING, TileCache
+
+logger = logging.getLogger(__name__)
+
+DATASET_VERSIONS_CHANNEL = "dataset_versions"
+
+DATASET_VERSIONS_QUERY = "SELECT name, version FROM dataset_versions"
+
+LISTENER_RECONNECT_MIN_S = 1.0
+LISTENER_RECONNECT_MAX_S = 60.0
+
+POINT_DETAIL_TABLES = ("insar_points", "insar_point_terrain")
+GBA_BUILDING_DETAIL_TABLES = ("gba_buildings", "building_terrain_context")
+OSM_BUILDING_DETAIL_TABLES = ("osm_buildings", "building_terrain_context")
+
+
+class DatasetVersions:
+    # Mirrors the dataset_versions table. The loaders NOTIFY after each bump,
+    # so a held LISTEN connection keeps the mirror current without polling.
+    def __init__(self):
+        self.versions: dict[str, int] = {}
+        self.listening = False
+        self.notifications = 0
+        self.reconnects = 0
+        self._dsn: str | None = None
+        self._conn: asyncpg.Connection | None = None
+        self._reconnect_task: asyncio.Task | None = None
+        self._closed = False
+
+    async def start(self, dsn: str) -> None:
+        self._dsn = dsn
+        if not await self._connect():
+            self._schedule_reconnect()
+
+    async def close(self) -> None:
+        self._closed = True
+        self.listening = False
+        if self._reconnect_task is not None:
+            self._reconnect_task.cancel()
+            with suppress(asyncio.CancelledError):
+                await self._reconnect_task
+            self._reconnect_task = None
+        conn, self._conn = self._conn, None
+        if conn is not None:
+            await conn.close()
+
+    async def _connect(self) -> bool:
+        try:
+            conn = await asyncpg.connect(dsn=self._dsn)
+        except (OSError, asyncpg.PostgresError) as exc:
+            logger.warning("Cannot connect dataset version listener, detail cache bypassed: %s", exc)
+            return False
+        try:
+            # Listen before reading so no bump between the two is lost. The
+            # re-read also covers bumps missed while disconnected.
+            await conn.add_listener(DATASET_VERSIONS_CHANNEL, self._on_notify)
+            rows = await conn.fetch(DATASET_VERSIONS_QUERY)
+        except (OSError, asyncpg.PostgresError) as exc:
+            logger.warning("Cannot listen for dataset versions, detail cache bypassed: %s", exc)
+            conn.terminate()
+            return False
+        self.versions = {row["name"]: row["version"] for row in rows}
+        self._conn = conn
+        conn.add_termination_listener(self._on_terminate)
+        self.listening = True
+        return True
+
+    def _schedule_reconnect(self) -> None:
+        if self._closed or (self._reconnect_task is not None and not self._reconnect_task.done()):
+            return
+        self._reconnect_task = asyncio.get_running_loop().create_task(self._reconnect())
+
+    async def _reconnect(self) -> None:
+        delay = LISTENER_RECONNECT_MIN_S
+        while not self._closed:
+            await asyncio.sleep(delay)
+            if await self._connect():
+                self.reconnects += 1
+                logger.warning("Dataset version listener reconnected; detail cache active")
+                return
+            delay = min(delay * 2, LISTENER_RECONNECT_MAX_S)
+
+    def _on_notify(self, conn, pid, channel, payload: str) -> None:
+        name, _, version = payload.rpartition(":")
+        try:
+            self.versions[name] = max(int(version), self.versions.get(name, 0))
+        except ValueError:
+            logger.warning("Ignoring malformed dataset version notification: %r", payload)
+            return
+        self.notifications += 1
+
+    def _on_terminate(self, conn) -> None:
+        if conn is not self._conn:
+            return
+        # A reload could go unnoticed while disconnected, so cached bodies are
+        # bypassed until the listener is back.
+        self._conn = None
+        self.listening = False
+        logger.warning("Dataset version listener closed; detail cache bypassed until reconnect")
+        self._schedule_reconnect()
+
+    def current(self, tables: tuple[str, ...]) -> tuple[int, ...] | None:
+        if not self.listening:
+            return None
+        return tuple(self.versions.get(table, 0) for table in tables)
+
+
+class DetailCache:
+    def __init__(self, max_bytes: int):
+        self.cache = TileCache(max_bytes)
+        self.versions = DatasetVersions()
+
+    async def start(self, dsn: str) -> None:
+        if self.cache.enabled:
+            await self.versions.start(dsn)
+
+    async def close(self) -> None:
+        await self.versions.close()
+
+    def lookup(self, key: tuple, tables: tuple[str, ...]) -> tuple[Response | None, Hashable]:
+        # key[0] names the route; a version change drops that route's entries.
+        version = self.versions.current(tables)
+        if version is None:
+            return None, None
+        body = self.cache.get(key, version)
+        if body is MISSING:
+            return None, version
+        return Response(content=body, media_type="application/json"), version
+
+    def store(self, key: tuple, version: Hashable, response: Response) -> None:
+        # The version is the one read before the query ran, so a reload that
+        # lands mid-request files the body under the old version.
+        if version is not None and response.status_code == 200:
+            self.cache.put(key, version, response.body)
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            "listening": self.versions.listening,
+            "notifications": self.versions.notifications,
+            "reconnects": self.versions.reconnects,
+            "dataset_versions": dict(self.versions.versions),
+            **self.cache.stats(),
+        }
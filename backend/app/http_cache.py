@@ -0,0 +1,29 @@
+from __future__ import annotations
+
+import hashlib
+
+from fastapi import Request, Response
+
+
+def etag_for(*parts) -> str:
+    key = "\x1f".join(str(part) for part in parts).encode("utf-8")
+    return f'"{hashlib.blake2b(key, digest_size=12).hexdigest()}"'
+
+
+def content_etag(data: bytes | memoryview) -> str:
+    return f'"{hashlib.blake2b(data, digest_size=12).hexdigest()}"'
+
+
+def etag_matches(request: Request, etag: str) -> bool:
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    # If-None-Match uses weak comparison, so W/ prefixes are ignored.
+    candidates = {candidate.strip().removeprefix("W/") for candidate in header.split(",")}
+    return etag.removeprefix("W/") in candidates
+
+
+def not_modified(headers: dict[str, str]) -> Response:
+    return Response(status_code=304, headers=headers)
@@ -8,9 +8,12 @@ from fastapi.staticfiles import StaticFiles
 
 from .config import settings
 from .db import connect_db, disconnect_db
+from .detail_cache import DetailCache
 from .ml.schema import ensure_ml_schema
 from .ml.store import fail_incomplete_runs
+from .ml.tile_attrs import backfill_tile_attrs
 from .routers import api, tiles, ml
+from .tilestore import close_tile_stores, open_tile_stores
 
 logger = logging.getLogger(__name__)
 
@@ -49,10 +52,14 @@ async def on_startup() -> None:
     for route in app.router.routes:
         if hasattr(route, "path") and "ml" in route.path:
             logger.warning("ML route registered: %s", route.path)
+    open_tile_stores(app)
+    for name in app.state.mbtiles.warm():
+        logger.warning("Building tile index for %s", name)
     await connect_db(app)
     async with app.state.db_pool.acquire() as conn:
         await ensure_ml_schema(conn)
         stale_runs = await fail_incomplete_runs(conn)
+        backfilled_runs = await backfill_tile_attrs(conn)
     for run in stale_runs:
         logger.warning(
             "Marked stale ML run as failed on startup: run_id=%s pipeline=%s mlflow_run_id=%s",
@@ -60,8 +67,16 @@ async def on_startup() -> None:
             run["pipeline"],
             run["mlflow_run_id"],
         )
+    for run_id in backfilled_runs:
+        logger.warning("Backfilled ML tile attributes for run_id=%s", run_id)
+    app.state.detail_cache = DetailCache(settings.detail_cache_mb * 1024 * 1024)
+    await app.state.detail_cache.start(settings.db_dsn)
 
 
 @app.on_event("shutdown")
 async def on_shutdown() -> None:
+    close_tile_stores(app)
+    detail_cache = getattr(app.state, "detail_cache", None)
+    if detail_cache:
+        await detail_cache.close()
     await disconnect_db(app)
@@ -0,0 +1,254 @@
+from __future__ import annotations
+
+import asyncio
+import gzip
+import json
+import logging
+import os
+import sqlite3
+from pathlib import Path
+from uuid import UUID, uuid4
+
+from ..config import settings
+from ..tilestore.mbtiles import tms_y
+from .tiles import ML_TILE_PROFILES, ml_buildings_tile_query, ml_points_tile_query
+
+logger = logging.getLogger(__name__)
+
+BAKED_TILES_SUBDIR = "ml_runs"
+
+POINT_EXTENT_QUERY = """
+    SELECT ST_XMin(e) AS min_lon, ST_YMin(e) AS min_lat, ST_XMax(e) AS max_lon, ST_YMax(e) AS max_lat
+    FROM (
+        SELECT ST_Extent(p.geom) AS e
+        FROM ml_point_tile_attrs a
+        JOIN insar_points p
+          ON p.area_id = a.area_id
+         AND p.dataset_id = a.dataset_id
+         AND p.code = a.code
+         AND p.track = a.track
+        WHERE a.run_id = $1::uuid
+    ) extent
+"""
+
+BUILDING_EXTENT_QUERY = """
+    SELECT ST_XMin(e) AS min_lon, ST_YMin(e) AS min_lat, ST_XMax(e) AS max_lon, ST_YMax(e) AS max_lat
+    FROM (
+        SELECT ST_Transform(ST_SetSRID(ST_Extent(geom_3857)::geometry, 3857), 4326) AS e
+        FROM ml_run_buildings
+        WHERE run_id = $1::uuid
+    ) extent
+"""
+
+# Lists the tiles at one zoom that hold any of the run's geometries, so the bake
+# never renders empty tiles inside the run's extent. Boxes grow by 1 cm to keep
+# features lying on a tile edge, which ST_Intersects assigns to both tiles.
+_TILE_INDEX_TEMPLATE = """
+    SELECT DISTINCT x, y
+    FROM (
+        SELECT ST_Expand(geom_3857, 0.01) AS box
+        FROM {table}
+        WHERE run_id = $1::uuid
+    ) boxes
+    CROSS JOIN LATERAL generate_series(
+        GREATEST(0, floor((ST_XMin(box) + 20037508.342789244) / $2::float8)::integer),
+        LEAST($3::integer, floor((ST_XMax(box) + 20037508.342789244) / $2::float8)::integer)
+    ) AS x
+    CROSS JOIN LATERAL generate_series(
+        GREATEST(0, floor((20037508.342789244 - ST_YMax(box)) / $2::float8)::integer),
+        LEAST($3::integer, floor((20037508.342789244 - ST_YMin(box)) / $2::float8)::integer)
+    ) AS y
+    ORDER BY x, y
+"""
+
+POINT_TILE_INDEX_QUERY = _TILE_INDEX_TEMPLATE.format(table="ml_point_tile_attrs")
+BUILDING_TILE_INDEX_QUERY = _TILE_INDEX_TEMPLATE.format(table="ml_run_buildings")
+
+ML_TILE_LAYERS = {
+    "points": ("ml_points", ml_points_tile_query, POINT_EXTENT_QUERY, POINT_TILE_INDEX_QUERY),
+    "buildings": (
+        "ml_buildings",
+        ml_buildings_tile_query,
+        BUILDING_EXTENT_QUERY,
+        BUILDING_TILE_INDEX_QUERY,
+    ),
+}
+
+WEB_MERCATOR_WIDTH = 2 * 20037508.342789244
+
+# Tiles are rendered and written in chunks of this size, so a zoom level never
+# sits in memory as a whole.
+BAKE_CHUNK_TILES = 256
+
+# Baked files hold the projection the viewer requests; other projections are
+# rendered on demand.
+BAKED_TILE_PROFILE = "map"
+
+MBTILES_SCHEMA = (
+    "CREATE TABLE metadata (name TEXT, value TEXT)",
+    "CREATE TABLE tiles (zoom_level INTEGER, tile_column INTEGER, tile_row INTEGER, tile_data BLOB)",
+    "CREATE UNIQUE INDEX tile_index ON tiles (zoom_level, tile_column, tile_row)",
+)
+
+
+def baked_tiles_name(run_id: str, layer: str) -> str | None:
+    try:
+        run_uuid = UUID(run_id)
+    except ValueError:
+        return None
+    suffix = "" if layer == "points" else f"_{layer}"
+    return f"{BAKED_TILES_SUBDIR}/{run_uuid}{suffix}"
+
+
+def baked_tile_fields(layer: str) -> tuple[str, ...]:
+    return ML_TILE_PROFILES[layer][BAKED_TILE_PROFILE]
+
+
+def baked_tiles_path(run_id: str, layer: str) -> Path | None:
+    name = baked_tiles_name(run_id, layer)
+    if name is None:
+        return None
+    return settings.tiles_dir / f"{name}.mbtiles"
+
+
+# Bumped whenever a run's baked files are dropped (recolor, delete). A bake
+# started under an older generation throws its output away instead of
+# replacing the newer state.
+_bake_generations: dict[str, int] = {}
+
+
+def _bake_current(run_id: str, generation: int) -> bool:
+    return _bake_generations.get(run_id, 0) == generation
+
+
+def drop_baked_tiles(run_id: str) -> None:
+    _bake_generations[run_id] = _bake_generations.get(run_id, 0) + 1
+    for layer in ML_TILE_LAYERS:
+        path = baked_tiles_path(run_id, layer)
+        if path is not None:
+            path.unlink(missing_ok=True)
+
+
+def _create_mbtiles(path: Path) -> sqlite3.Connection:
+    conn = sqlite3.connect(path, check_same_thread=False)
+    conn.execute("PRAGMA journal_mode=OFF")
+    conn.execute("PRAGMA synchronous=OFF")
+    for statement in MBTILES_SCHEMA:
+        conn.execute(statement)
+    return conn
+
+
+def _write_tiles(conn: sqlite3.Connection, tiles: list[tuple[int, int, int, bytes]]) -> None:
+    conn.executemany(
+        "INSERT INTO tiles (zoom_level, tile_column, tile_row, tile_data) VALUES (?, ?, ?, ?)",
+        [(z, x, tms_y(z, y), gzip.compress(mvt, compresslevel=6)) for z, x, y, mvt in tiles],
+    )
+    conn.commit()
+
+
+def _write_metadata(conn: sqlite3.Connection, metadata: dict[str, str]) -> None:
+    conn.executemany("INSERT INTO metadata (name, value) VALUES (?, ?)", metadata.items())
+    conn.commit()
+    conn.close()
+
+
+async def _render_chunk(pool, tile_query_for, run_id, fields, z, coords, limit) -> list:
+    async def render(x: int, y: int):
+        query, args = tile_query_for(z, x, y, run_id, fields)
+        # Connections are taken per tile, so a long bake shares the pool with
+        # API requests instead of pinning connections for its whole duration.
+        async with limit, pool.acquire() as conn:
+            return await conn.fetchval(query, *args)
+
+    mvts = await asyncio.gather(*(render(x, y) for x, y in coords))
+    return [(z, x, y, mvt) for (x, y), mvt in zip(coords, mvts) if mvt]
+
+
+async def _bake_layer(
+    pool,
+    run_id: str,
+    generation: int,
+    layer: str,
+    min_zoom: int,
+    max_zoom: int,
+) -> int:
+    layer_name, tile_query_for, extent_query, tile_index_query = ML_TILE_LAYERS[layer]
+    fields = baked_tile_fields(layer)
+    async with pool.acquire() as conn:
+        extent = await conn.fetchrow(extent_query, run_id)
+    if extent is None or extent["min_lon"] is None:
+        return 0
+    bounds = (extent["min_lon"], extent["min_lat"], extent["max_lon"], extent["max_lat"])
+
+    target = baked_tiles_path(run_id, layer)
+    target.parent.mkdir(parents=True, exist_ok=True)
+    # A unique scratch name keeps a recolor re-bake from colliding with a bake
+    # that is still running for the same run.
+    scratch = target.with_name(f".{target.name}.{uuid4().hex}.tmp")
+    writer = await asyncio.to_thread(_create_mbtiles, scratch)
+    limit = asyncio.Semaphore(max(1, settings.ml_tile_bake_concurrency))
+    count = 0
+    try:
+        for z in range(min_zoom, max_zoom + 1):
+            if not _bake_current(run_id, generation):
+                break
+            async with pool.acquire() as conn:
+                rows = await conn.fetch(
+                    tile_index_query,
+                    run_id,
+                    WEB_MERCATOR_WIDTH / (1 << z),
+                    (1 << z) - 1,
+                )
+            coords = [(row["x"], row["y"]) for row in rows]
+            for start in range(0, len(coords), BAKE_CHUNK_TILES):
+                chunk = coords[start : start + BAKE_CHUNK_TILES]
+                tiles = await _render_chunk(pool, tile_query_for, run_id, fields, z, chunk, limit)
+                await asyncio.to_thread(_write_tiles, writer, tiles)
+                count += len(tiles)
+        metadata = {
+            "name": f"{layer_name} {run_id}",
+            "format": "pbf",
+            "type": "overlay",
+            "minzoom": str(min_zoom),
+            "maxzoom": str(max_zoom),
+            "bounds": ",".join(str(value) for value in bounds),
+            "json": json.dumps(
+                {"vector_layers": [{"id": layer_name, "fields": {name: "" for name in fields}}]}
+            ),
+        }
+        await asyncio.to_thread(_write_metadata, writer, metadata)
+        async with pool.acquire() as conn:
+            still_succeeded = await conn.fetchval(
+                "SELECT status = 'succeeded' FROM ml_runs WHERE run_id = $1::uuid",
+                run_id,
+            )
+        # No await from here to the replace: a recolor or delete either bumped
+        # the generation already or runs its drop after the file is in place.
+        if not still_succeeded or not _bake_current(run_id, generation):
+            # The run was deleted, reset or recolored while baking.
+            scratch.unlink(missing_ok=True)
+            return 0
+        os.replace(scratch, target)
+    except BaseException:
+        writer.close()
+        scratch.unlink(missing_ok=True)
+        raise
+    return count
+
+
+async def bake_run_tiles(
+    pool,
+    run_id: str,
+    min_zoom: int | None = None,
+    max_zoom: int | None = None,
+) -> dict[str, int]:
+    min_zoom = settings.ml_tile_bake_min_zoom if min_zoom is None else min_zoom
+    max_zoom = settings.ml_tile_bake_max_zoom if max_zoom is None else max_zoom
+    if max_zoom < min_zoom:
+        return {}
+    generation = _bake_generations.get(run_id, 0)
+    counts = {}
+    for layer in ML_TILE_LAYERS:
+        counts[layer] = await _bake_layer(pool, run_id, generation, layer, min_zoom, max_zoom)
+    logger.info("Baked ML run tiles run_id=%s tiles=%s", run_id, counts)
+    return counts
@@ -3,6 +3,8 @@ from __future__ import annotations
 import hashlib
 from typing import Dict, List, Set, Tuple
 
+from .tile_attrs import sync_run_building_colors
+
 PALETTE_SIZE = 60
 NEIGHBOR_DISTANCE_M = 5.0
 
@@ -183,5 +185,6 @@ async def assign_building_colors(pool, run_id: str) -> int:
             """,
             records,
         )
+        await sync_run_building_colors(conn, run_id)
 
     return len(records)
@@ -0,0 +1,170 @@
+from __future__ import annotations
+
+import asyncio
+import json
+import struct
+from typing import AsyncIterator
+
+import orjson
+import pyarrow as pa
+import pyarrow.parquet as pq
+from fastapi import FastAPI
+
+from ..columnar import ChunkSink
+from ..db import iter_batches
+from ..responses import dumps_json
+
+EXPORT_BATCH_ROWS = 10_000
+
+EXPORT_QUERY = """
+    SELECT
+        r.area_id,
+        r.dataset_id,
+        r.code,
+        r.track,
+        r.cluster_id,
+        r.building_source,
+        r.building_id,
+        r.distance_m,
+        r.score,
+        r.anomaly_score,
+        r.quality_score,
+        r.cross_track_consistency,
+        r.label,
+        r.feature_set_version,
+        r.model_set_version,
+        p.velocity,
+        p.coherence,
+        r.meta::text AS meta,
+        ST_X(p.geom) AS lon,
+        ST_Y(p.geom) AS lat
+    FROM ml_point_results r
+    JOIN insar_points p
+      ON p.area_id = r.area_id
+     AND p.dataset_id = r.dataset_id
+     AND p.code = r.code
+     AND p.track = r.track
+    WHERE r.run_id = $1::uuid
+"""
+
+EXPORT_SCHEMA = pa.schema(
+    [
+        ("area_id", pa.string()),
+        ("dataset_id", pa.string()),
+        ("code", pa.string()),
+        ("track", pa.int32()),
+        ("cluster_id", pa.string()),
+        ("building_source", pa.string()),
+        ("building_id", pa.string()),
+        ("distance_m", pa.float64()),
+        ("score", pa.float64()),
+        ("anomaly_score", pa.float64()),
+        ("quality_score", pa.float64()),
+        ("cross_track_consistency", pa.float64()),
+        ("label", pa.string()),
+        ("feature_set_version", pa.string()),
+        ("model_set_version", pa.string()),
+        ("velocity", pa.float64()),
+        ("coherence", pa.float64()),
+        ("meta", pa.string()),
+        ("geometry", pa.binary()),
+    ]
+)
+
+EXPORT_PROPERTIES = tuple(name for name in EXPORT_SCHEMA.names if name not in {"meta", "geometry"})
+
+# Coordinates are EPSG:4326 lon/lat, which is the GeoParquet default CRS.
+GEOPARQUET_METADATA = {
+    "version": "1.0.0",
+    "primary_column": "geometry",
+    "columns": {"geometry": {"encoding": "WKB", "geometry_types": ["Point"]}},
+}
+
+EXPORT_FORMATS = {
+    "ndjson": ("application/x-ndjson", "ndjson"),
+    "geojson": ("application/geo+json", "geojson"),
+    "parquet": ("application/vnd.apache.parquet", "parquet"),
+}
+
+_WKB_POINT = struct.Struct("<BIdd")
+
+
+def _fetch_batches(app: FastAPI, run_id: str) -> AsyncIterator[list]:
+    # A read-only snapshot keeps the export consistent with itself.
+    return iter_batches(
+        app,
+        EXPORT_QUERY,
+        run_id,
+        batch_size=EXPORT_BATCH_ROWS,
+        isolation="repeatable_read",
+    )
+
+
+def _feature_json(row) -> bytes:
+    # orjson writes non-finite scores as null; json.dumps would emit NaN,
+    # which is not valid JSON.
+    properties = {name: row[name] for name in EXPORT_PROPERTIES}
+    properties["meta"] = orjson.loads(row["meta"]) if row["meta"] else None
+    return dumps_json(
+        {
+            "type": "Feature",
+            "geometry": {"type": "Point", "coordinates": [row["lon"], row["lat"]]},
+            "properties": properties,
+        }
+    )
+
+
+async def _ndjson_chunks(app: FastAPI, run_id: str) -> AsyncIterator[bytes]:
+    async for rows in _fetch_batches(app, run_id):
+        yield b"".join(_feature_json(row) + b"\n" for row in rows)
+
+
+async def _geojson_chunks(app: FastAPI, run_id: str) -> AsyncIterator[bytes]:
+    yield b'{"type":"FeatureCollection","features":['
+    separator = b""
+    async for rows in _fetch_batches(app, run_id):
+        yield separator + b",".join(_feature_json(row) for row in rows)
+        separator = b","
+    yield b"]}\n"
+
+
+def _record_batch(rows) -> pa.RecordBatch:
+    columns = [[row[name] for row in rows] for name in EXPORT_SCHEMA.names[:-1]]
+    columns.append([_WKB_POINT.pack(1, 1, row["lon"], row["lat"]) for row in rows])
+    return pa.RecordBatch.from_arrays(
+        [pa.array(values, type=field.type) for values, field in zip(columns, EXPORT_SCHEMA)],
+        schema=EXPORT_SCHEMA,
+    )
+
+
+def _write_row_group(writer: pq.ParquetWriter, sink: ChunkSink, rows) -> bytes:
+    writer.write_batch(_record_batch(rows))
+    return sink.drain()
+
+
+def _close_writer(writer: pq.ParquetWriter, sink: ChunkSink) -> bytes:
+    writer.close()
+    return sink.drain()
+
+
+async def _parquet_chunks(app: FastAPI, run_id: str) -> AsyncIterator[bytes]:
+    sink = ChunkSink()
+    schema = EXPORT_SCHEMA.with_metadata({"geo": json.dumps(GEOPARQUET_METADATA)})
+    writer = pq.ParquetWriter(sink, schema, compression="zstd")
+    try:
+        async for rows in _fetch_batches(app, run_id):
+            chunk = await asyncio.to_thread(_write_row_group, writer, sink, rows)
+            if chunk:
+                yield chunk
+        yield await asyncio.to_thread(_close_writer, writer, sink)
+    finally:
+        if writer.is_open:
+            writer.close()
+
+
+def stream_run_export(app: FastAPI, run_id: str, export_format: str) -> AsyncIterator[bytes]:
+    if export_format == "parquet":
+        return _parquet_chunks(app, run_id)
+    if export_format == "geojson":
+        return _geojson_chunks(app, run_id)
+    return _ndjson_chunks(app, run_id)
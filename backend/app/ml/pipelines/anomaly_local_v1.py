@@ -18,6 +18,7 @@ except ImportError:  # pragma: no cover - exercised in runtime environments with
     hdbscan = None
 
 from .base import BasePipeline
+from ..tile_attrs import write_tile_attrs
 from ..track_geometry import get_track_geometry, track_geometry_values_cte
 
 
@@ -419,6 +420,44 @@ class AnomalyLocalV1Pipeline(BasePipeline):
             ORDER BY t.track, t.code, t.date
         """
 
+        keyed_series_query = """
+            SELECT t.area_id, t.dataset_id, t.code, t.track, t.date, t.{value}
+            FROM unnest($3::text[], $4::int[]) AS k(code, track)
+            JOIN {table} t
+              ON t.area_id = $1
+             AND t.dataset_id = $2
+             AND t.code = k.code
+             AND t.track = k.track
+            ORDER BY t.track, t.code, t.date
+        """
+        keyed_timeseries_query = keyed_series_query.format(value="displacement", table="insar_timeseries")
+        keyed_amplitude_query = keyed_series_query.format(
+            value="amplitude",
+            table="insar_amplitude_timeseries",
+        )
+
+        packed_query = """
+            WITH envelope AS (
+                SELECT ST_MakeEnvelope($1, $2, $3, $4, 4326) AS geom
+            )
+            SELECT s.dataset_id, s.code, s.track, v.dates, s.displacement, s.amplitude
+            FROM insar_timeseries_packed s
+            JOIN insar_points p
+              ON p.area_id = s.area_id
+             AND p.dataset_id = s.dataset_id
+             AND p.code = s.code
+             AND p.track = s.track
+            JOIN envelope ON ST_Intersects(p.geom, envelope.geom)
+            JOIN insar_timeseries_dates v
+              ON v.area_id = s.area_id
+             AND v.dataset_id = s.dataset_id
+             AND v.track = s.track
+            WHERE p.area_id = $6
+              AND p.dataset_id = $7
+              AND ($5::integer IS NULL OR p.track = $5)
+            ORDER BY s.track, s.code
+        """
+
         async with pool.acquire() as conn:
             base_rows = await conn.fetch(
                 points_query,
@@ -436,29 +475,43 @@ class AnomalyLocalV1Pipeline(BasePipeline):
                 area_id,
                 dataset_id,
             )
-            ts_rows = await conn.fetch(
-                timeseries_query,
-                min_lon,
-                min_lat,
-                max_lon,
-                max_lat,
-                track_param,
-                area_id,
-                dataset_id,
-            )
-            amp_rows = await conn.fetch(
-                amplitude_query,
-                min_lon,
-                min_lat,
-                max_lon,
-                max_lat,
-                track_param,
-                area_id,
-                dataset_id,
-            )
+            series_args = (min_lon, min_lat, max_lon, max_lat, track_param, area_id, dataset_id)
+            packed_rows = await conn.fetch(packed_query, *series_args)
+            if not packed_rows:
+                # Dataset not packed yet by load_postgis.py: read the long tables.
+                ts_rows = await conn.fetch(timeseries_query, *series_args)
+                amp_rows = await conn.fetch(amplitude_query, *series_args)
+            else:
+                ts_rows, amp_rows = self._unpack_series_rows(packed_rows)
+                packed_keys = {(row["code"], row["track"]) for row in packed_rows}
+                unpacked = sorted(
+                    {(row["code"], row["track"]) for row in base_rows} - packed_keys
+                )
+                if unpacked:
+                    # Partly packed scope: read the remaining points from the long tables.
+                    codes = [code for code, _ in unpacked]
+                    tracks = [track for _, track in unpacked]
+                    ts_rows.extend(
+                        await conn.fetch(keyed_timeseries_query, area_id, dataset_id, codes, tracks)
+                    )
+                    amp_rows.extend(
+                        await conn.fetch(keyed_amplitude_query, area_id, dataset_id, codes, tracks)
+                    )
 
         return base_rows, ts_rows, amp_rows
 
+    def _unpack_series_rows(self, packed_rows) -> tuple[list[dict[str, Any]], list[dict[str, Any]]]:
+        ts_rows: list[dict[str, Any]] = []
+        amp_rows: list[dict[str, Any]] = []
+        for row in packed_rows:
+            key = {"dataset_id": row["dataset_id"], "code": row["code"], "track": row["track"]}
+            for epoch, displacement, amplitude in zip(row["dates"], row["displacement"], row["amplitude"]):
+                if displacement is not None:
+                    ts_rows.append({**key, "date": epoch, "displacement": displacement})
+                if amplitude is not None:
+                    amp_rows.append({**key, "date": epoch, "amplitude": amplitude})
+        return ts_rows, amp_rows
+
     def _compute_run(self, base_rows, ts_rows, amp_rows, params: dict[str, Any]):
         records = self._build_records(base_rows, ts_rows, amp_rows)
         self._compute_series_features(records)
@@ -1959,6 +2012,7 @@ class AnomalyLocalV1Pipeline(BasePipeline):
 
         async with pool.acquire() as conn:
             await conn.executemany(insert_query, payloads)
+            await write_tile_attrs(conn, run_id)
 
     def _cluster_matrix(self, records: list[LocalPointRecord]) -> np.ndarray:
         matrix = np.asarray(
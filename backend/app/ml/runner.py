@@ -10,6 +10,7 @@ from typing import Any, Dict
 import asyncpg
 import mlflow
 
+from .bake import bake_run_tiles
 from .registry import get_pipeline
 from .types import RunConfig
 from .colors import assign_building_colors
@@ -133,6 +134,13 @@ async def run_pipeline_async(
                 finished_at=datetime.now(timezone.utc),
             )
 
+        # Results are final now. Baking only speeds up tile serving, so a failure
+        # leaves the run on dynamically rendered tiles.
+        try:
+            await bake_run_tiles(pool, config.run_id)
+        except Exception as exc:  # pylint: disable=broad-except
+            logger.warning("Baking tiles failed for run %s: %s", config.run_id, exc)
+
         return metrics
     except Exception as exc:  # pylint: disable=broad-except
         async with pool.acquire() as conn:
@@ -0,0 +1,254 @@
+from __future__ import annotations
+
+POINT_TILE_ATTRS_INSERT = """
+    INSERT INTO ml_point_tile_attrs (
+        run_id,
+        area_id,
+        dataset_id,
+        code,
+        track,
+        cluster_id,
+        building_source,
+        building_id,
+        distance_m,
+        score,
+        anomaly_score,
+        quality_score,
+        cross_track_consistency,
+        label,
+        feature_set_version,
+        model_set_version,
+        velocity,
+        coherence,
+        method,
+        height_band,
+        degraded_reason,
+        cluster_role,
+        cluster_probability,
+        cluster_outlier_score,
+        is_main_cluster,
+        cluster_rank,
+        gate_excluded,
+        kept_for_scoring,
+        building_track_point_count,
+        kept_point_count_track,
+        other_track_point_count,
+        step_support,
+        building_velocity_robust_z,
+        building_motion_mm_a,
+        building_reliability_score,
+        building_reliability_band,
+        weak_secondary_track_flag,
+        agreement_tension_flag,
+        reliability_penalties_json,
+        differential_motion_flag,
+        building_status,
+        track_agreement_score,
+        building_cluster_count,
+        reliable_cluster_count,
+        neighbour_context_available,
+        neighbour_misassignment_flag,
+        neighbour_event_flag,
+        neighbour_event_score,
+        supporting_neighbour_count,
+        top_reason,
+        cluster_color_index,
+        geom_3857
+    )
+    SELECT
+        r.run_id,
+        r.area_id,
+        r.dataset_id,
+        r.code,
+        r.track,
+        r.cluster_id,
+        r.building_source,
+        r.building_id,
+        r.distance_m,
+        r.score,
+        r.anomaly_score,
+        r.quality_score,
+        r.cross_track_consistency,
+        r.label,
+        r.feature_set_version,
+        r.model_set_version,
+        p.velocity,
+        p.coherence,
+        (r.meta->>'method'),
+        (r.meta->'feature_flags'->>'height_band'),
+        (r.meta->'feature_flags'->>'degraded_reason'),
+        (r.meta->'cluster'->>'cluster_role'),
+        (r.meta->'cluster'->>'cluster_probability')::double precision,
+        (r.meta->'cluster'->>'cluster_outlier_score')::double precision,
+        COALESCE((r.meta->'cluster_rollup'->>'is_main_cluster')::boolean, false),
+        (r.meta->'cluster_rollup'->>'cluster_rank')::integer,
+        COALESCE((r.meta->'visual_context'->>'gate_excluded')::boolean, false),
+        COALESCE((r.meta->'visual_context'->>'kept_for_scoring')::boolean, false),
+        (r.meta->'building_context'->>'track_point_count')::integer,
+        (r.meta->'building_context'->>'kept_point_count_track')::integer,
+        (r.meta->'building_context'->>'other_track_point_count')::integer,
+        (r.meta->'building_context'->>'step_support')::double precision,
+        (r.meta->'building_context'->>'building_velocity_robust_z')::double precision,
+        (r.meta->'building_rollup'->>'building_motion_mm_a')::double precision,
+        (r.meta->'building_rollup'->>'building_reliability_score')::double precision,
+        (r.meta->'building_rollup'->>'building_reliability_band'),
+        COALESCE((r.meta->'building_rollup'->>'weak_secondary_track_flag')::boolean, false),
+        COALESCE((r.meta->'building_rollup'->>'agreement_tension_flag')::boolean, false),
+        COALESCE((r.meta->'building_rollup'->'reliability_penalties')::text, '[]'),
+        COALESCE((r.meta->'building_rollup'->>'differential_motion_flag')::boolean, false),
+        (r.meta->'building_rollup'->>'building_status'),
+        (r.meta->'building_rollup'->>'track_agreement_score')::double precision,
+        (r.meta->'building_rollup'->>'cluster_count')::integer,
+        (r.meta->'building_rollup'->>'reliable_cluster_count')::integer,
+        COALESCE((r.meta->'neighbour_context'->>'context_available')::boolean, false),
+        COALESCE((r.meta->'neighbour_context'->>'neighbour_misassignment_flag')::boolean, false),
+        COALESCE((r.meta->'neighbour_context'->>'neighbour_event_flag')::boolean, false),
+        (r.meta->'neighbour_context'->>'neighbour_event_score')::double precision,
+        (r.meta->'neighbour_context'->>'supporting_neighbour_count')::integer,
+        (r.meta->'explain_top_features'->0->>'summary'),
+        abs(hashtext(coalesce(r.cluster_id, r.code))) % 60,
+        ST_Transform(p.geom, 3857)
+    FROM ml_point_results r
+    JOIN insar_points p
+      ON p.area_id = r.area_id
+     AND p.dataset_id = r.dataset_id
+     AND p.code = r.code
+     AND p.track = r.track
+    WHERE r.run_id = $1::uuid
+"""
+
+RUN_BUILDINGS_INSERT = """
+    INSERT INTO ml_run_buildings (
+        run_id,
+        area_id,
+        building_source,
+        building_id,
+        building_motion_mm_a,
+        building_reliability_score,
+        building_reliability_band,
+        weak_secondary_track_flag,
+        agreement_tension_flag,
+        reliability_penalties_json,
+        differential_motion_flag,
+        building_status,
+        track_agreement_score,
+        cluster_count,
+        reliable_cluster_count,
+        point_count,
+        kept_point_count,
+        noise_point_count,
+        excluded_point_count,
+        main_cluster_by_track_json,
+        neighbour_context_available,
+        neighbour_candidate_building_count,
+        neighbour_misassignment_point_count,
+        neighbour_misassignment_share,
+        neighbour_event_flag,
+        neighbour_event_score,
+        neighbour_consistency_score,
+        supporting_neighbour_count,
+        supporting_track_count
+    )
+    SELECT DISTINCT ON (area_id, building_source, building_id)
+        run_id,
+        area_id,
+        building_source,
+        building_id,
+        (meta->'building_rollup'->>'building_motion_mm_a')::double precision,
+        (meta->'building_rollup'->>'building_reliability_score')::double precision,
+        (meta->'building_rollup'->>'building_reliability_band'),
+        COALESCE((meta->'building_rollup'->>'weak_secondary_track_flag')::boolean, false),
+        COALESCE((meta->'building_rollup'->>'agreement_tension_flag')::boolean, false),
+        COALESCE((meta->'building_rollup'->'reliability_penalties')::text, '[]'),
+        COALESCE((meta->'building_rollup'->>'differential_motion_flag')::boolean, false),
+        (meta->'building_rollup'->>'building_status'),
+        (meta->'building_rollup'->>'track_agreement_score')::double precision,
+        (meta->'building_rollup'->>'cluster_count')::integer,
+        (meta->'building_rollup'->>'reliable_cluster_count')::integer,
+        (meta->'building_rollup'->>'point_count')::integer,
+        (meta->'building_rollup'->>'kept_point_count')::integer,
+        (meta->'building_rollup'->>'noise_point_count')::integer,
+        (meta->'building_rollup'->>'excluded_point_count')::integer,
+        COALESCE((meta->'building_rollup'->'main_cluster_by_track')::text, '{}'),
+        COALESCE((meta->'building_rollup'->>'neighbour_context_available')::boolean, false),
+        (meta->'building_rollup'->>'neighbour_candidate_building_count')::integer,
+        (meta->'building_rollup'->>'neighbour_misassignment_point_count')::integer,
+        (meta->'building_rollup'->>'neighbour_misassignment_share')::double precision,
+        COALESCE((meta->'building_rollup'->>'neighbour_event_flag')::boolean, false),
+        (meta->'building_rollup'->>'neighbour_event_score')::double precision,
+        (meta->'building_rollup'->>'neighbour_consistency_score')::double precision,
+        (meta->'building_rollup'->>'supporting_neighbour_count')::integer,
+        (meta->'building_rollup'->>'supporting_track_count')::integer
+    FROM ml_point_results
+    WHERE run_id = $1::uuid
+      AND building_id IS NOT NULL
+    ORDER BY
+        area_id,
+        building_source,
+        building_id,
+        COALESCE((meta->'cluster_rollup'->>'cluster_rank')::integer, 999),
+        track,
+        code
+"""
+
+RUN_BUILDINGS_GBA_FOOTPRINT_UPDATE = """
+    UPDATE ml_run_buildings rb
+    SET height_m = b.height,
+        geom_3857 = ST_Transform(b.geom, 3857)
+    FROM gba_buildings b
+    WHERE rb.run_id = $1::uuid
+      AND rb.building_source = 'gba'
+      AND b.area_id = rb.area_id
+      AND b.gba_id::text = rb.building_id
+"""
+
+RUN_BUILDINGS_OSM_FOOTPRINT_UPDATE = """
+    UPDATE ml_run_buildings rb
+    SET geom_3857 = ST_Transform(b.geom, 3857)
+    FROM osm_buildings b
+    WHERE rb.run_id = $1::uuid
+      AND rb.building_source = 'osm'
+      AND b.area_id = rb.area_id
+      AND b.osm_id::text = rb.building_id
+"""
+
+RUN_BUILDINGS_COLOR_UPDATE = """
+    UPDATE ml_run_buildings rb
+    SET color_index = c.color_index
+    FROM ml_building_colors c
+    WHERE rb.run_id = $1::uuid
+      AND c.run_id = rb.run_id
+      AND c.area_id = rb.area_id
+      AND c.building_source = rb.building_source
+      AND c.building_id = rb.building_id
+"""
+
+MISSING_TILE_ATTR_RUNS_QUERY = """
+    SELECT r.run_id::text AS run_id
+    FROM ml_runs r
+    WHERE r.status = 'succeeded'
+      AND EXISTS (SELECT 1 FROM ml_point_results pr WHERE pr.run_id = r.run_id)
+      AND NOT EXISTS (SELECT 1 FROM ml_point_tile_attrs a WHERE a.run_id = r.run_id)
+"""
+
+
+async def write_tile_attrs(conn, run_id: str) -> None:
+    async with conn.transaction():
+        await conn.execute("DELETE FROM ml_point_tile_attrs WHERE run_id = $1::uuid", run_id)
+        await conn.execute("DELETE FROM ml_run_buildings WHERE run_id = $1::uuid", run_id)
+        await conn.execute(POINT_TILE_ATTRS_INSERT, run_id)
+        await conn.execute(RUN_BUILDINGS_INSERT, run_id)
+        await conn.execute(RUN_BUILDINGS_GBA_FOOTPRINT_UPDATE, run_id)
+        await conn.execute(RUN_BUILDINGS_OSM_FOOTPRINT_UPDATE, run_id)
+        await conn.execute(RUN_BUILDINGS_COLOR_UPDATE, run_id)
+
+
+async def sync_run_building_colors(conn, run_id: str) -> None:
+    await conn.execute(RUN_BUILDINGS_COLOR_UPDATE, run_id)
+
+
+async def backfill_tile_attrs(conn) -> list[str]:
+    run_ids = [row["run_id"] for row in await conn.fetch(MISSING_TILE_ATTR_RUNS_QUERY)]
+    for run_id in run_ids:
+        await write_tile_attrs(conn, run_id)
+    return run_ids
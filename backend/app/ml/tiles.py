@@ -0,0 +1,378 @@
+from __future__ import annotations
+
+from functools import lru_cache
+
+from ..config import settings
+
+ML_POINT_TILE_COLUMNS = {
+    **{
+        name: f"a.{name}"
+        for name in (
+            "area_id",
+            "dataset_id",
+            "code",
+            "track",
+            "cluster_id",
+            "building_source",
+            "building_id",
+            "distance_m",
+            "score",
+            "anomaly_score",
+            "quality_score",
+            "cross_track_consistency",
+            "label",
+            "feature_set_version",
+            "model_set_version",
+            "velocity",
+            "coherence",
+            "method",
+            "height_band",
+            "degraded_reason",
+            "cluster_role",
+            "cluster_probability",
+            "cluster_outlier_score",
+            "is_main_cluster",
+            "cluster_rank",
+            "gate_excluded",
+            "kept_for_scoring",
+            "building_track_point_count",
+            "kept_point_count_track",
+            "other_track_point_count",
+            "step_support",
+            "building_velocity_robust_z",
+            "building_motion_mm_a",
+            "building_reliability_score",
+            "building_reliability_band",
+            "weak_secondary_track_flag",
+            "agreement_tension_flag",
+            "reliability_penalties_json",
+            "differential_motion_flag",
+            "building_status",
+            "track_agreement_score",
+            "building_cluster_count",
+            "reliable_cluster_count",
+            "neighbour_context_available",
+            "neighbour_misassignment_flag",
+            "neighbour_event_flag",
+            "neighbour_event_score",
+            "supporting_neighbour_count",
+            "top_reason",
+        )
+    },
+    "assigned": "(a.building_id IS NOT NULL)",
+    "cluster_color_index": "a.cluster_color_index",
+    "building_color_index": (
+        "COALESCE(c.color_index, abs(hashtext(coalesce(a.building_id, a.code))) % 60)"
+    ),
+}
+
+ML_POINTS_COLOR_JOIN = """
+        LEFT JOIN ml_building_colors c
+          ON c.run_id = a.run_id
+         AND c.area_id = a.area_id
+         AND c.building_source = a.building_source
+         AND c.building_id = a.building_id"""
+
+ML_POINTS_TILE_TEMPLATE = """
+    WITH bounds AS (
+        SELECT ST_TileEnvelope($1, $2, $3) AS geom
+    ),
+    mvtgeom AS (
+        SELECT
+            {columns}ST_AsMVTGeom(a.geom_3857, bounds.geom, 4096, 64, true) AS geom
+        FROM bounds
+        JOIN ml_point_tile_attrs a
+          ON a.run_id = $4::uuid
+         AND ST_Intersects(a.geom_3857, bounds.geom){color_join}
+    )
+    SELECT ST_AsMVT(mvtgeom, 'ml_points', 4096, 'geom') AS mvt
+    FROM mvtgeom
+"""
+
+ML_POINTS_AGGREGATE_TILE_QUERY = """
+    WITH bounds AS (
+        SELECT ST_TileEnvelope($1, $2, $3) AS geom
+    ),
+    grid AS (
+        SELECT
+            geom,
+            ST_XMin(geom) AS x0,
+            ST_YMin(geom) AS y0,
+            (ST_XMax(geom) - ST_XMin(geom)) / $5::integer AS cell_size
+        FROM bounds
+    ),
+    binned AS (
+        SELECT
+            floor((ST_X(a.geom_3857) - grid.x0) / grid.cell_size)::integer AS cell_x,
+            floor((ST_Y(a.geom_3857) - grid.y0) / grid.cell_size)::integer AS cell_y,
+            ST_X(a.geom_3857) AS px,
+            ST_Y(a.geom_3857) AS py,
+            a.label,
+            a.anomaly_score,
+            a.quality_score,
+            a.cross_track_consistency,
+            a.cluster_color_index,
+            COALESCE(c.color_index, abs(hashtext(coalesce(a.building_id, a.code))) % 60) AS building_color_index
+        FROM grid
+        JOIN ml_point_tile_attrs a
+          ON a.run_id = $4::uuid
+         AND ST_Intersects(a.geom_3857, grid.geom)
+        LEFT JOIN ml_building_colors c
+          ON c.run_id = a.run_id
+         AND c.area_id = a.area_id
+         AND c.building_source = a.building_source
+         AND c.building_id = a.building_id
+    ),
+    mvtgeom AS (
+        SELECT
+            true AS aggregated,
+            count(*) AS point_count,
+            count(*) FILTER (WHERE label = 'normal') AS normal_count,
+            count(*) FILTER (WHERE label = 'suspect') AS suspect_count,
+            count(*) FILTER (WHERE label = 'outlier') AS outlier_count,
+            CASE
+                WHEN bool_or(label = 'outlier') THEN 'outlier'
+                WHEN bool_or(label = 'suspect') THEN 'suspect'
+                WHEN bool_or(label = 'normal') THEN 'normal'
+            END AS worst_label,
+            -- Same property names as the per-point layer so the map styles keep working.
+            CASE
+                WHEN bool_or(label = 'outlier') THEN 'outlier'
+                WHEN bool_or(label = 'suspect') THEN 'suspect'
+                WHEN bool_or(label = 'normal') THEN 'normal'
+            END AS label,
+            avg(anomaly_score) AS anomaly_score,
+            avg(quality_score) AS quality_score,
+            avg(cross_track_consistency) AS cross_track_consistency,
+            mode() WITHIN GROUP (ORDER BY cluster_color_index) AS cluster_color_index,
+            mode() WITHIN GROUP (ORDER BY building_color_index) AS building_color_index,
+            ST_AsMVTGeom(
+                ST_SetSRID(ST_MakePoint(avg(px), avg(py)), 3857),
+                (SELECT geom FROM bounds),
+                4096,
+                64,
+                true
+            ) AS geom
+        FROM binned
+        GROUP BY cell_x, cell_y
+    )
+    SELECT ST_AsMVT(mvtgeom, 'ml_points', 4096, 'geom') AS mvt
+    FROM mvtgeom
+"""
+
+ML_BUILDING_TILE_COLUMNS = {
+    **{
+        name: f"rb.{name}"
+        for name in (
+            "area_id",
+            "building_id",
+            "building_source",
+            "height_m",
+            "building_motion_mm_a",
+            "building_reliability_score",
+            "building_reliability_band",
+            "weak_secondary_track_flag",
+            "agreement_tension_flag",
+            "reliability_penalties_json",
+            "differential_motion_flag",
+            "building_status",
+            "track_agreement_score",
+            "cluster_count",
+            "reliable_cluster_count",
+            "point_count",
+            "kept_point_count",
+            "noise_point_count",
+            "excluded_point_count",
+            "main_cluster_by_track_json",
+            "neighbour_context_available",
+            "neighbour_candidate_building_count",
+            "neighbour_misassignment_point_count",
+            "neighbour_misassignment_share",
+            "neighbour_event_flag",
+            "neighbour_event_score",
+            "neighbour_consistency_score",
+            "supporting_neighbour_count",
+            "supporting_track_count",
+        )
+    },
+    "building_color_index": (
+        "COALESCE(rb.color_index, abs(hashtext(rb.area_id || ':' || rb.building_id)) % 60)"
+    ),
+}
+
+# ml_run_buildings carries the rollup, colour and footprint of every building
+# in the run, so a tile only touches the buildings it intersects.
+ML_BUILDINGS_TILE_TEMPLATE = """
+    WITH bounds AS (
+        SELECT ST_TileEnvelope($1, $2, $3) AS geom
+    ),
+    mvtgeom AS (
+        SELECT
+            {columns}ST_AsMVTGeom(rb.geom_3857, bounds.geom, 4096, 64, true) AS geom
+        FROM bounds
+        JOIN ml_run_buildings rb
+          ON rb.run_id = $4::uuid
+         AND ST_Intersects(rb.geom_3857, bounds.geom)
+    )
+    SELECT ST_AsMVT(mvtgeom, 'ml_buildings', 4096, 'geom') AS mvt
+    FROM mvtgeom
+"""
+
+# Named attribute sets for the ML tile routes. "map" is what the viewer styles,
+# tooltips and click handlers read; "style" only carries the coloring inputs.
+ML_TILE_PROFILES = {
+    "points": {
+        "map": (
+            "area_id",
+            "dataset_id",
+            "code",
+            "track",
+            "cluster_id",
+            "building_id",
+            "anomaly_score",
+            "quality_score",
+            "cross_track_consistency",
+            "label",
+            "method",
+            "degraded_reason",
+            "cluster_role",
+            "is_main_cluster",
+            "gate_excluded",
+            "neighbour_context_available",
+            "neighbour_misassignment_flag",
+            "neighbour_event_flag",
+            "neighbour_event_score",
+            "supporting_neighbour_count",
+            "top_reason",
+            "cluster_color_index",
+            "building_color_index",
+        ),
+        "style": (
+            "anomaly_score",
+            "quality_score",
+            "cross_track_consistency",
+            "label",
+            "cluster_role",
+            "gate_excluded",
+            "cluster_color_index",
+            "building_color_index",
+        ),
+    },
+    "buildings": {
+        "map": (
+            "area_id",
+            "building_id",
+            "building_source",
+            "height_m",
+            "building_motion_mm_a",
+            "building_reliability_score",
+            "building_reliability_band",
+            "weak_secondary_track_flag",
+            "agreement_tension_flag",
+            "differential_motion_flag",
+            "building_status",
+            "track_agreement_score",
+            "cluster_count",
+            "reliable_cluster_count",
+            "neighbour_context_available",
+            "neighbour_candidate_building_count",
+            "neighbour_misassignment_point_count",
+            "neighbour_misassignment_share",
+            "neighbour_event_flag",
+            "neighbour_event_score",
+            "neighbour_consistency_score",
+            "supporting_neighbour_count",
+            "supporting_track_count",
+            "building_color_index",
+        ),
+        "style": (
+            "height_m",
+            "building_motion_mm_a",
+            "building_reliability_score",
+            "building_reliability_band",
+            "track_agreement_score",
+            "building_color_index",
+        ),
+    },
+}
+
+ML_TILE_COLUMNS = {
+    "points": ML_POINT_TILE_COLUMNS,
+    "buildings": ML_BUILDING_TILE_COLUMNS,
+}
+
+
+def resolve_tile_fields(
+    layer: str,
+    profile: str | None,
+    fields: str | None,
+) -> tuple[str, ...] | None:
+    if profile and fields:
+        raise ValueError("Use either profile or fields, not both")
+    columns = ML_TILE_COLUMNS[layer]
+    if profile:
+        if profile == "full":
+            return None
+        if profile not in ML_TILE_PROFILES[layer]:
+            raise ValueError(f"Unknown tile profile: {profile}")
+        return ML_TILE_PROFILES[layer][profile]
+    if not fields:
+        return None
+    requested = {name.strip() for name in fields.split(",") if name.strip()}
+    if not requested:
+        raise ValueError("No tile fields requested")
+    unknown = sorted(requested - columns.keys())
+    if unknown:
+        raise ValueError(f"Unknown tile fields: {', '.join(unknown)}")
+    # Canonical column order so equivalent requests share one cache entry.
+    return tuple(name for name in columns if name in requested)
+
+
+def tile_fields_key(fields: tuple[str, ...] | None) -> str:
+    return "full" if fields is None else ",".join(fields)
+
+
+def _select_list(columns: dict[str, str], fields: tuple[str, ...] | None) -> str:
+    names = columns if fields is None else fields
+    return "".join(f"{columns[name]} AS {name},\n            " for name in names)
+
+
+@lru_cache(maxsize=64)
+def _points_tile_query(fields: tuple[str, ...] | None) -> str:
+    needs_colors = fields is None or "building_color_index" in fields
+    return ML_POINTS_TILE_TEMPLATE.format(
+        columns=_select_list(ML_POINT_TILE_COLUMNS, fields),
+        color_join=ML_POINTS_COLOR_JOIN if needs_colors else "",
+    )
+
+
+@lru_cache(maxsize=64)
+def _buildings_tile_query(fields: tuple[str, ...] | None) -> str:
+    return ML_BUILDINGS_TILE_TEMPLATE.format(columns=_select_list(ML_BUILDING_TILE_COLUMNS, fields))
+
+
+ML_POINTS_TILE_QUERY = _points_tile_query(None)
+ML_BUILDINGS_TILE_QUERY = _buildings_tile_query(None)
+
+
+def ml_points_tile_query(
+    z: int,
+    x: int,
+    y: int,
+    run_id: str,
+    fields: tuple[str, ...] | None = None,
+) -> tuple[str, tuple]:
+    # Aggregated cells carry their own small attribute set regardless of projection.
+    if z <= settings.ml_tile_aggregate_max_zoom:
+        return ML_POINTS_AGGREGATE_TILE_QUERY, (z, x, y, run_id, settings.ml_tile_aggregate_cells)
+    return _points_tile_query(fields), (z, x, y, run_id)
+
+
+def ml_buildings_tile_query(
+    z: int,
+    x: int,
+    y: int,
+    run_id: str,
+    fields: tuple[str, ...] | None = None,
+) -> tuple[str, tuple]:
+    return _buildings_tile_query(fields), (z, x, y, run_id)
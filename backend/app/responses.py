@@ -0,0 +1,33 @@
+from __future__ import annotations
+
+from typing import Any
+
+import orjson
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel
+
+# UTC datetimes end in "Z" like Pydantic's own JSON output; numpy scalars from
+# the ML rollups serialize natively.
+ORJSON_OPTIONS = orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_UTC_Z
+
+
+def _default(value: Any) -> Any:
+    if isinstance(value, BaseModel):
+        return value.model_dump()
+    return jsonable_encoder(value)
+
+
+def dumps_json(content: Any) -> bytes:
+    return orjson.dumps(content, default=_default, option=ORJSON_OPTIONS)
+
+
+class FastJSONResponse(JSONResponse):
+    def render(self, content: Any) -> bytes:
+        return dumps_json(content)
+
+
+def model_response(model: BaseModel) -> FastJSONResponse:
+    # The model was validated when it was built. Returning a Response makes
+    # FastAPI skip the second response_model validation and jsonable_encoder pass.
+    return FastJSONResponse(model.model_dump())
@@ -1,12 +1,39 @@
 from __future__ import annotations
 
+import base64
+import binascii
 import json
 
-from fastapi import APIRouter, HTTPException, Query, Request
+import pyarrow as pa
+from fastapi import APIRouter, HTTPException, Query, Request, Response
+from fastapi.responses import StreamingResponse
 
 from ..area_metadata import area_contracts, dataset_contracts, resolve_area_dataset
-from ..db import fetch_all, fetch_one
+from ..columnar import (
+    ARROW_STREAM_MEDIA_TYPE,
+    NDJSON_MEDIA_TYPE,
+    arrow_stream_bytes,
+    arrow_stream_chunks,
+    ndjson_bytes,
+    ndjson_chunks,
+)
+from ..db import fetch_all, fetch_one, iter_batches
+from ..detail_cache import (
+    GBA_BUILDING_DETAIL_TABLES,
+    OSM_BUILDING_DETAIL_TABLES,
+    POINT_DETAIL_TABLES,
+)
 from ..ml.track_geometry import track_geometries_contract
+from ..responses import FastJSONResponse, model_response
+from ..timeseries import (
+    TIMESERIES_BINARY_MEDIA_TYPE,
+    columns_bytes,
+    columns_payload,
+    downsample_columns,
+    downsample_rows,
+    fetch_timeseries_batch,
+    fetch_timeseries_columns,
+)
 from ..schemas import (
     BuildingDetail,
     BuildingTerrainContext,
@@ -14,6 +41,9 @@ from ..schemas import (
     HealthResponse,
     InSARPointDetail,
     PointTerrainContext,
+    TimeseriesBatchRequest,
+    TimeseriesBatchResponse,
+    TimeseriesColumnsResponse,
     TimeseriesResponse,
 )
 router = APIRouter(prefix="/api", tags=["api"])
@@ -28,6 +58,45 @@ VELOCITY_THRESHOLDS = {
     "strong_uplift": 5.0,
 }
 
+# Column order matches the SELECT list of points_query.
+POINTS_ARROW_SCHEMA = pa.schema(
+    [
+        ("area_id", pa.dictionary(pa.int32(), pa.string())),
+        ("dataset_id", pa.dictionary(pa.int32(), pa.string())),
+        ("sensor", pa.dictionary(pa.int32(), pa.string())),
+        ("code", pa.string()),
+        ("track", pa.int32()),
+        ("los", pa.dictionary(pa.int32(), pa.string())),
+        ("velocity", pa.float64()),
+        ("coherence", pa.float64()),
+        ("lon", pa.float64()),
+        ("lat", pa.float64()),
+    ]
+)
+
+
+def _encode_points_cursor(row) -> str:
+    key = [row["velocity"], row["dataset_id"], row["code"], row["track"]]
+    return base64.urlsafe_b64encode(json.dumps(key).encode("utf-8")).decode("ascii")
+
+
+def _decode_points_cursor(value: str) -> list:
+    try:
+        key = json.loads(base64.urlsafe_b64decode(value.encode("ascii")))
+    except (ValueError, binascii.Error) as exc:
+        raise HTTPException(status_code=400, detail="Invalid cursor") from exc
+    if (
+        not isinstance(key, list)
+        or len(key) != 4
+        or not isinstance(key[0], (int, float))
+        or not isinstance(key[1], str)
+        or not isinstance(key[2], str)
+        or not isinstance(key[3], int)
+    ):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return [float(key[0]), key[1], key[2], key[3]]
+
+
 def _parse_json_value(value):
     if isinstance(value, str):
         try:
@@ -109,6 +178,11 @@ async def config() -> ConfigResponse:
     )
 
 
+@router.get("/cache/stats")
+async def detail_cache_stats(request: Request) -> dict:
+    return request.app.state.detail_cache.stats()
+
+
 @router.get("/points/{code}", response_model=InSARPointDetail)
 async def point_detail(
     request: Request,
@@ -123,6 +197,12 @@ async def point_detail(
         dataset_id,
         default_dataset_when_omitted=True,
     )
+    detail_cache = app.state.detail_cache
+    cache_key = ("points", code, track, resolved_area_id, resolved_dataset_id)
+    cached, cache_version = detail_cache.lookup(cache_key, POINT_DETAIL_TABLES)
+    if cached is not None:
+        return cached
+
     base_query = """
         SELECT p.area_id, p.dataset_id, p.sensor,
                p.code, p.track, p.los, p.velocity, p.velocity_std, p.coherence,
@@ -162,7 +242,7 @@ async def point_detail(
     if row is None:
         raise HTTPException(status_code=404, detail="Point not found")
 
-    return InSARPointDetail(
+    response = InSARPointDetail(
         area_id=row["area_id"],
         dataset_id=row["dataset_id"],
         sensor=row["sensor"],
@@ -188,17 +268,96 @@ async def point_detail(
         geometry={"lon": row["lon"], "lat": row["lat"]},
         terrain=_build_point_terrain(row),
     )
+    response = model_response(response)
+    detail_cache.store(cache_key, cache_version, response)
+    return response
 
 
-@router.get("/points/{code}/timeseries", response_model=TimeseriesResponse)
+async def _point_timeseries_columns(
+    app,
+    point_where: str,
+    params: list,
+    response_format: str,
+    max_points: int | None,
+):
+    point = await fetch_one(
+        app,
+        f"""
+            SELECT area_id, dataset_id, sensor, code, track
+            FROM insar_points p
+            WHERE {point_where}
+            ORDER BY dataset_id, track
+            LIMIT 1
+        """,
+        *params,
+    )
+    if point is None:
+        raise HTTPException(status_code=404, detail="Timeseries not found")
+    columns = await fetch_timeseries_columns(
+        app,
+        point["area_id"],
+        point["dataset_id"],
+        point["code"],
+        point["track"],
+    )
+    if not len(columns):
+        raise HTTPException(status_code=404, detail="Timeseries not found")
+    if max_points is not None:
+        columns = downsample_columns(columns, max_points)
+
+    if response_format == "binary":
+        return Response(
+            content=columns_bytes(columns),
+            media_type=TIMESERIES_BINARY_MEDIA_TYPE,
+            headers={
+                "X-Dataset-Id": point["dataset_id"],
+                "X-Sensor": point["sensor"],
+                "X-Track": str(point["track"]),
+                "X-Epoch-Count": str(len(columns)),
+            },
+        )
+    return FastJSONResponse(
+        {
+            "area_id": point["area_id"],
+            "dataset_id": point["dataset_id"],
+            "sensor": point["sensor"],
+            "code": point["code"],
+            "track": point["track"],
+            **columns_payload(columns),
+        }
+    )
+
+
+@router.get(
+    "/points/{code}/timeseries",
+    response_model=TimeseriesResponse | TimeseriesColumnsResponse,
+)
 async def point_timeseries(
     request: Request,
     code: str,
     track: int | None = Query(default=None, description="Optional track"),
     area_id: str | None = Query(default=None),
     dataset_id: str | None = Query(default=None),
+    layout: str = Query(
+        default="rows",
+        pattern="^(rows|columns)$",
+        description="rows (one object per epoch) or columns (parallel arrays)",
+    ),
+    response_format: str = Query(
+        default="json",
+        alias="format",
+        pattern="^(json|binary)$",
+        description="json or binary (little-endian columns, requires layout=columns)",
+    ),
+    max_points: int | None = Query(
+        default=None,
+        ge=10,
+        description="Downsample each series to at most this many epochs (LTTB)",
+    ),
 ):
     app = request.app
+    if response_format == "binary" and layout != "columns":
+        raise HTTPException(status_code=400, detail="format=binary requires layout=columns")
     resolved_area_id, resolved_dataset_id = _resolve_area_dataset_or_404(
         area_id,
         dataset_id,
@@ -217,6 +376,9 @@ async def point_timeseries(
         param_idx += 1
     point_where = " AND ".join(point_filters)
 
+    if layout == "columns":
+        return await _point_timeseries_columns(app, point_where, params, response_format, max_points)
+
     base_query = f"""
         WITH point_filter AS (
             SELECT area_id, dataset_id, sensor, code, track
@@ -262,17 +424,57 @@ async def point_timeseries(
     rows = await fetch_all(app, base_query, *params)
     if not rows:
         raise HTTPException(status_code=404, detail="Timeseries not found")
+    if max_points is not None:
+        rows = downsample_rows(rows, max_points)
+
+    # Column types already match TimeseriesResponse, so the rows are serialized
+    # directly instead of being validated into one model per measurement.
+    return FastJSONResponse(
+        {
+            "area_id": rows[0]["area_id"],
+            "dataset_id": rows[0]["dataset_id"],
+            "sensor": rows[0]["sensor"],
+            "code": rows[0]["code"],
+            "track": rows[0]["track"],
+            "measurements": [
+                {"date": r["date"], "displacement": r.get("displacement"), "amplitude": r.get("amplitude")}
+                for r in rows
+            ],
+        }
+    )
 
-    return TimeseriesResponse(
-        area_id=rows[0]["area_id"],
-        dataset_id=rows[0]["dataset_id"],
-        sensor=rows[0]["sensor"],
-        code=rows[0]["code"],
-        track=rows[0]["track"],
-        measurements=[
-            {"date": r["date"], "displacement": r.get("displacement"), "amplitude": r.get("amplitude")}
-            for r in rows
-        ],
+
+@router.post("/timeseries/batch", response_model=TimeseriesBatchResponse)
+async def timeseries_batch(request: Request, payload: TimeseriesBatchRequest):
+    keys = []
+    for point in payload.points:
+        resolved_area_id, resolved_dataset_id = _resolve_area_dataset_or_404(
+            None,
+            point.dataset_id,
+            default_dataset_when_omitted=False,
+        )
+        keys.append((resolved_area_id, resolved_dataset_id, point.code, point.track))
+    keys = list(dict.fromkeys(keys))
+
+    series = await fetch_timeseries_batch(request.app, keys)
+    return FastJSONResponse(
+        {
+            "series": [
+                {
+                    "area_id": area_id,
+                    "dataset_id": dataset_id,
+                    "code": code,
+                    "track": track,
+                    **columns_payload(columns),
+                }
+                for (area_id, dataset_id, code, track), columns in series.items()
+            ],
+            "missing": [
+                {"dataset_id": dataset_id, "code": code, "track": track}
+                for area_id, dataset_id, code, track in keys
+                if (area_id, dataset_id, code, track) not in series
+            ],
+        }
     )
 
 
@@ -310,6 +512,12 @@ async def gba_building_detail(
         WHERE gba_buildings.area_id = $1
           AND gba_id = $2
     """
+    detail_cache = app.state.detail_cache
+    cache_key = ("buildings:gba", building_id, resolved_area_id)
+    cached, cache_version = detail_cache.lookup(cache_key, GBA_BUILDING_DETAIL_TABLES)
+    if cached is not None:
+        return cached
+
     row = await fetch_one(app, query, resolved_area_id, building_id)
     if row is None:
         raise HTTPException(status_code=404, detail="GBA building not found")
@@ -318,7 +526,7 @@ async def gba_building_detail(
     geometry = _ensure_dict(record.pop("geometry"))
     attributes = _ensure_dict(record.get("properties") or {})
 
-    return BuildingDetail(
+    response = BuildingDetail(
         area_id=row["area_id"],
         id=str(row["id"]),
         source="gba",
@@ -327,6 +535,9 @@ async def gba_building_detail(
         attributes=attributes,
         terrain=_build_building_terrain(row),
     )
+    response = model_response(response)
+    detail_cache.store(cache_key, cache_version, response)
+    return response
 
 
 @router.get("/buildings/osm/{osm_id}", response_model=BuildingDetail)
@@ -364,6 +575,12 @@ async def osm_building_detail(
         WHERE osm_buildings.area_id = $1
           AND osm_id = $2
     """
+    detail_cache = app.state.detail_cache
+    cache_key = ("buildings:osm", osm_id, resolved_area_id)
+    cached, cache_version = detail_cache.lookup(cache_key, OSM_BUILDING_DETAIL_TABLES)
+    if cached is not None:
+        return cached
+
     row = await fetch_one(app, query, resolved_area_id, osm_id)
     if row is None:
         raise HTTPException(status_code=404, detail="OSM building not found")
@@ -372,7 +589,7 @@ async def osm_building_detail(
     geometry = _ensure_dict(record.pop("geometry"))
     attributes = _ensure_dict(record.get("tags") or {})
 
-    return BuildingDetail(
+    response = BuildingDetail(
         area_id=row["area_id"],
         id=str(row["id"]),
         source="osm",
@@ -382,6 +599,9 @@ async def osm_building_detail(
         attributes=attributes,
         terrain=_build_building_terrain(row),
     )
+    response = model_response(response)
+    detail_cache.store(cache_key, cache_version, response)
+    return response
 
 
 @router.get("/points")
@@ -394,7 +614,15 @@ async def points_query(
     velocity_min: float | None = Query(default=None),
     velocity_max: float | None = Query(default=None),
     coherence_min: float | None = Query(default=None),
-    limit: int = Query(default=5000, le=20000),
+    limit: int = Query(default=5000, ge=1, le=20000),
+    response_format: str = Query(
+        default="json",
+        alias="format",
+        pattern="^(json|arrow|ndjson)$",
+        description="json, arrow (Arrow IPC stream) or ndjson",
+    ),
+    cursor: str | None = Query(default=None, description="next_cursor of the previous page"),
+    stream: bool = Query(default=False, description="Stream every match instead of one page"),
 ):
     app = request.app
     try:
@@ -435,6 +663,14 @@ async def points_query(
         conditions.append(f"p.coherence >= ${param_idx}")
         params.append(coherence_min)
         param_idx += 1
+    if cursor is not None:
+        # Keyset continuation; dataset_id keeps the key unique across datasets.
+        conditions.append(
+            f"(p.velocity, p.dataset_id, p.code, p.track) > "
+            f"(${param_idx}, ${param_idx + 1}, ${param_idx + 2}, ${param_idx + 3})"
+        )
+        params.extend(_decode_points_cursor(cursor))
+        param_idx += 4
 
     where_clause = " AND ".join(conditions)
     query = f"""
@@ -443,13 +679,40 @@ async def points_query(
                ST_X(p.geom) AS lon, ST_Y(p.geom) AS lat
         FROM insar_points p
         WHERE {where_clause}
-        ORDER BY p.velocity ASC
-        LIMIT {limit}
+        ORDER BY p.velocity ASC, p.dataset_id ASC, p.code ASC, p.track ASC
     """
 
-    rows = await fetch_all(app, query, *params)
+    if stream:
+        if response_format == "arrow":
+            chunks = arrow_stream_chunks(POINTS_ARROW_SCHEMA, iter_batches(app, query, *params))
+            return StreamingResponse(chunks, media_type=ARROW_STREAM_MEDIA_TYPE)
+        if response_format == "ndjson":
+            chunks = ndjson_chunks(POINTS_ARROW_SCHEMA.names, iter_batches(app, query, *params))
+            return StreamingResponse(chunks, media_type=NDJSON_MEDIA_TYPE)
+        raise HTTPException(status_code=400, detail="stream requires format=arrow or format=ndjson")
+
+    # One extra row tells whether another page follows.
+    rows = await fetch_all(app, f"{query} LIMIT {limit + 1}", *params)
+    next_cursor = _encode_points_cursor(rows[limit - 1]) if len(rows) > limit else None
+    rows = rows[:limit]
+    page_headers = {"X-Point-Count": str(len(rows))}
+    if next_cursor is not None:
+        page_headers["X-Next-Cursor"] = next_cursor
+    if response_format == "arrow":
+        return Response(
+            content=arrow_stream_bytes(POINTS_ARROW_SCHEMA, rows),
+            media_type=ARROW_STREAM_MEDIA_TYPE,
+            headers=page_headers,
+        )
+    if response_format == "ndjson":
+        return Response(
+            content=ndjson_bytes(POINTS_ARROW_SCHEMA.names, rows),
+            media_type=NDJSON_MEDIA_TYPE,
+            headers=page_headers,
+        )
     return {
         "count": len(rows),
+        "next_cursor": next_cursor,
         "points": [
             {
                 "code": r["code"],
@@ -11,10 +11,12 @@ from uuid import uuid4
 import mlflow
 import numpy as np
 from fastapi import APIRouter, HTTPException, Query, Request, Response
+from fastapi.responses import StreamingResponse
 
 from ..area_metadata import resolve_area_dataset
 from ..config import settings
 from ..db import fetch_one
+from ..http_cache import content_etag, etag_matches, not_modified
 from ..schemas import (
     GeoJsonFeature,
     MLBuildingAnalysis,
@@ -29,7 +31,9 @@ from ..schemas import (
     MLRunDetail,
     MLRunSummary,
 )
+from ..ml.bake import bake_run_tiles, baked_tile_fields, baked_tiles_name, drop_baked_tiles
 from ..ml.colors import assign_building_colors
+from ..ml.export import EXPORT_FORMATS, stream_run_export
 from ..ml.rollups import (
     building_rollup_from_meta,
     cluster_rollup_from_meta,
@@ -44,11 +48,19 @@ from ..ml.rollups import (
     track_motion_map,
     track_string_map,
 )
+from ..ml.tiles import (
+    ml_buildings_tile_query,
+    ml_points_tile_query,
+    resolve_tile_fields,
+    tile_fields_key,
+)
 from ..ml.track_geometry import track_geometry_values_cte
 from ..ml.registry import get_pipeline, list_pipelines
 from ..ml.runner import run_pipeline_async
 from ..ml.store import create_run_record, fetch_run_detail, fetch_runs
 from ..ml.types import RunConfig
+from ..responses import model_response
+from .tiles import mbtiles_tile_response
 
 router = APIRouter(prefix="/api/ml", tags=["ml"])
 logger = logging.getLogger(__name__)
@@ -77,6 +89,99 @@ def _json_object(value) -> dict[str, Any]:
     return {}
 
 
+def _mvt_response(request: Request, mvt: bytes) -> Response:
+    # Run tiles change on recolor and delete, so clients revalidate every time
+    # and get a 304 when the generated tile is byte-identical.
+    cache_headers = {
+        "Cache-Control": "no-cache",
+        "ETag": content_etag(mvt),
+    }
+    if etag_matches(request, cache_headers["ETag"]):
+        return not_modified(cache_headers)
+    return Response(
+        content=mvt,
+        headers={"Content-Type": "application/x-protobuf", **cache_headers},
+    )
+
+
+async def _baked_tile_response(
+    request: Request,
+    run_id: str,
+    layer: str,
+    z: int,
+    x: int,
+    y: int,
+) -> Response | None:
+    name = baked_tiles_name(run_id, layer)
+    if name is None:
+        return None
+    mbtiles = request.app.state.mbtiles
+    reader = mbtiles.reader(name)
+    if reader is None:
+        return None
+    metadata = await mbtiles.metadata(reader)
+    if z < metadata.minzoom or z > metadata.maxzoom:
+        return None
+    # A recolor replaces the baked file under the same URL. The ETag follows the
+    # file signature, so revalidation picks up the re-bake.
+    return await mbtiles_tile_response(request, reader, z, x, y, cache_control="no-cache")
+
+
+async def _run_tiles_cacheable(request: Request, run_id: str) -> bool:
+    cache = request.app.state.ml_tile_cache
+    if cache.settled(run_id):
+        return True
+    generation = cache.generation(run_id)
+    row = await fetch_one(request.app, "SELECT status FROM ml_runs WHERE run_id = $1::uuid", run_id)
+    # Queued and running runs are still writing results, so their tiles are never cached.
+    if row is None or row["status"] != "succeeded":
+        return False
+    cache.mark_settled(run_id, generation)
+    return True
+
+
+async def _run_tile_response(
+    request: Request,
+    run_id: str,
+    layer: str,
+    z: int,
+    x: int,
+    y: int,
+    tile_query,
+    profile: str | None,
+    fields: str | None,
+) -> Response:
+    try:
+        selected = resolve_tile_fields(layer, profile, fields)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc)) from exc
+
+    if selected == baked_tile_fields(layer):
+        baked = await _baked_tile_response(request, run_id, layer, z, x, y)
+        if baked is not None:
+            return baked
+
+    cache = request.app.state.ml_tile_cache
+    cache_layer = f"{layer}:{tile_fields_key(selected)}"
+    cacheable = await _run_tiles_cacheable(request, run_id)
+    if cacheable:
+        generation = cache.generation(run_id)
+        mvt = await cache.get(run_id, cache_layer, z, x, y)
+        if mvt is not None:
+            return _mvt_response(request, mvt)
+    else:
+        cache.bypass()
+
+    query, args = tile_query(z, x, y, run_id, selected)
+    row = await fetch_one(request.app, query, *args)
+    if row is None or row["mvt"] is None:
+        raise HTTPException(status_code=404, detail="Tile not found")
+    if cacheable:
+        await cache.put(run_id, cache_layer, z, x, y, generation, row["mvt"])
+
+    return _mvt_response(request, row["mvt"])
+
+
 def _rollup_bool(rollup: dict[str, Any], key: str) -> bool:
     value = _nested_bool({"value": rollup.get(key)}, "value")
     return value if value is not None else False
@@ -219,10 +324,41 @@ async def recolor_run(request: Request, run_id: str):
         row = await conn.fetchrow("SELECT run_id FROM ml_runs WHERE run_id = $1", run_id)
         if row is None:
             raise HTTPException(status_code=404, detail="Run not found")
+    # Baked tiles carry the old colors. Serve dynamic tiles until the re-bake lands.
+    drop_baked_tiles(run_id)
     count = await assign_building_colors(request.app.state.db_pool, run_id)
+    await request.app.state.ml_tile_cache.purge(run_id)
+    task = asyncio.create_task(bake_run_tiles(request.app.state.db_pool, run_id))
+    task.add_done_callback(_log_task_result)
     return {"run_id": run_id, "building_colors": count}
 
 
+@router.get("/runs/{run_id}/export")
+async def export_run(
+    request: Request,
+    run_id: str,
+    export_format: str = Query(
+        default="ndjson",
+        alias="format",
+        pattern="^(ndjson|geojson|parquet)$",
+        description="ndjson (one GeoJSON feature per line), geojson or parquet (GeoParquet)",
+    ),
+) -> StreamingResponse:
+    async with request.app.state.db_pool.acquire() as conn:
+        row = await conn.fetchrow("SELECT run_id FROM ml_runs WHERE run_id = $1", run_id)
+    if row is None:
+        raise HTTPException(status_code=404, detail="Run not found")
+    media_type, extension = EXPORT_FORMATS[export_format]
+    return StreamingResponse(
+        stream_run_export(request.app, run_id, export_format),
+        media_type=media_type,
+        headers={
+            "Cache-Control": "no-store",
+            "Content-Disposition": f'attachment; filename="ml_run_{run_id}.{extension}"',
+        },
+    )
+
+
 @router.get("/runs/{run_id}/points/{code}", response_model=MLPointAnalysisResponse)
 async def ml_point_analysis(
     request: Request,
@@ -273,14 +409,16 @@ async def ml_point_analysis(
         if run is None:
             raise HTTPException(status_code=404, detail="Run not found")
         if run["status"] in {"queued", "running"}:
-            return MLPointAnalysisResponse(
+            response = MLPointAnalysisResponse(
                 status="pending",
                 message="ML point result is not available yet for this run.",
             )
-        return MLPointAnalysisResponse(
+            return model_response(response)
+        response = MLPointAnalysisResponse(
             status="missing",
             message="ML point result not found for this point in the selected run.",
         )
+        return model_response(response)
 
     meta = _parse_meta(row.get("meta"))
     cluster_meta = _nested_dict(meta, "cluster")
@@ -295,7 +433,7 @@ async def ml_point_analysis(
         if isinstance(item, dict)
     ]
 
-    return MLPointAnalysisResponse(
+    response = MLPointAnalysisResponse(
         status="ready",
         analysis=MLPointAnalysis(
             run_id=str(row["run_id"]),
@@ -331,6 +469,7 @@ async def ml_point_analysis(
             explain_top_features=explain,
         ),
     )
+    return model_response(response)
 
 
 @router.get("/runs/{run_id}/buildings/{source}/{building_id}", response_model=MLBuildingAnalysis)
@@ -468,7 +607,7 @@ async def ml_building_analysis(
             "excluded_point_count": excluded_point_count,
         }
 
-    return MLBuildingAnalysis(
+    response = MLBuildingAnalysis(
         run_id=str(run["run_id"]),
         pipeline=run["pipeline"],
         run_type=run["run_type"],
@@ -604,6 +743,7 @@ async def ml_building_analysis(
             for row in rows[:8]
         ],
     )
+    return model_response(response)
 
 
 @router.get(
@@ -784,7 +924,7 @@ async def ml_building_points_visualization(
             )
         )
 
-    return MLBuildingVisualizationPointsResponse(
+    response = MLBuildingVisualizationPointsResponse(
         run_id=str(run["run_id"]),
         pipeline=run["pipeline"],
         run_type=run["run_type"],
@@ -793,6 +933,7 @@ async def ml_building_points_visualization(
         point_count=len(features),
         feature_collection={"type": "FeatureCollection", "features": features},
     )
+    return model_response(response)
 
 
 @router.get(
@@ -1082,7 +1223,7 @@ async def ml_building_context_visualization(
     ]
 
     summary_rollup = building_rollup_from_meta(_parse_meta(summary_row.get("meta"))) if summary_row else {}
-    return MLBuildingVisualizationContextResponse(
+    response = MLBuildingVisualizationContextResponse(
         run_id=str(run["run_id"]),
         pipeline=run["pipeline"],
         run_type=run["run_type"],
@@ -1148,268 +1289,36 @@ async def ml_building_context_visualization(
             "supporting_track_count": _rollup_int(summary_rollup, "supporting_track_count"),
         },
     )
+    return model_response(response)
 
 
 @router.get("/runs/{run_id}/tiles/{z}/{x}/{y}.pbf")
-async def ml_tiles(request: Request, run_id: str, z: int, x: int, y: int) -> Response:
-    query = """
-        WITH bounds AS (
-            SELECT ST_TileEnvelope($1, $2, $3) AS geom
-        ),
-        mvtgeom AS (
-            SELECT
-                r.area_id,
-                r.dataset_id,
-                r.code,
-                r.track,
-                r.cluster_id,
-                r.building_source,
-                r.building_id,
-                r.distance_m,
-                r.score,
-                r.anomaly_score,
-                r.quality_score,
-                r.cross_track_consistency,
-                r.label,
-                r.feature_set_version,
-                r.model_set_version,
-                p.velocity,
-                p.coherence,
-                (r.meta->>'method') AS method,
-                (r.meta->'feature_flags'->>'height_band') AS height_band,
-                (r.meta->'feature_flags'->>'degraded_reason') AS degraded_reason,
-                (r.meta->'cluster'->>'cluster_role') AS cluster_role,
-                (r.meta->'cluster'->>'cluster_probability')::double precision AS cluster_probability,
-                (r.meta->'cluster'->>'cluster_outlier_score')::double precision AS cluster_outlier_score,
-                COALESCE((r.meta->'cluster_rollup'->>'is_main_cluster')::boolean, false) AS is_main_cluster,
-                (r.meta->'cluster_rollup'->>'cluster_rank')::integer AS cluster_rank,
-                COALESCE((r.meta->'visual_context'->>'gate_excluded')::boolean, false) AS gate_excluded,
-                COALESCE((r.meta->'visual_context'->>'kept_for_scoring')::boolean, false) AS kept_for_scoring,
-                (r.meta->'building_context'->>'track_point_count')::integer AS building_track_point_count,
-                (r.meta->'building_context'->>'kept_point_count_track')::integer AS kept_point_count_track,
-                (r.meta->'building_context'->>'other_track_point_count')::integer AS other_track_point_count,
-                (r.meta->'building_context'->>'step_support')::double precision AS step_support,
-                (r.meta->'building_context'->>'building_velocity_robust_z')::double precision AS building_velocity_robust_z,
-                (r.meta->'building_rollup'->>'building_motion_mm_a')::double precision AS building_motion_mm_a,
-                (r.meta->'building_rollup'->>'building_reliability_score')::double precision AS building_reliability_score,
-                (r.meta->'building_rollup'->>'building_reliability_band') AS building_reliability_band,
-                COALESCE((r.meta->'building_rollup'->>'weak_secondary_track_flag')::boolean, false)
-                    AS weak_secondary_track_flag,
-                COALESCE((r.meta->'building_rollup'->>'agreement_tension_flag')::boolean, false)
-                    AS agreement_tension_flag,
-                COALESCE((r.meta->'building_rollup'->'reliability_penalties')::text, '[]')
-                    AS reliability_penalties_json,
-                COALESCE((r.meta->'building_rollup'->>'differential_motion_flag')::boolean, false) AS differential_motion_flag,
-                (r.meta->'building_rollup'->>'building_status') AS building_status,
-                (r.meta->'building_rollup'->>'track_agreement_score')::double precision AS track_agreement_score,
-                (r.meta->'building_rollup'->>'cluster_count')::integer AS building_cluster_count,
-                (r.meta->'building_rollup'->>'reliable_cluster_count')::integer AS reliable_cluster_count,
-                COALESCE((r.meta->'neighbour_context'->>'context_available')::boolean, false)
-                    AS neighbour_context_available,
-                COALESCE((r.meta->'neighbour_context'->>'neighbour_misassignment_flag')::boolean, false)
-                    AS neighbour_misassignment_flag,
-                COALESCE((r.meta->'neighbour_context'->>'neighbour_event_flag')::boolean, false)
-                    AS neighbour_event_flag,
-                (r.meta->'neighbour_context'->>'neighbour_event_score')::double precision
-                    AS neighbour_event_score,
-                (r.meta->'neighbour_context'->>'supporting_neighbour_count')::integer
-                    AS supporting_neighbour_count,
-                (r.meta->'explain_top_features'->0->>'summary') AS top_reason,
-                (r.building_id IS NOT NULL) AS assigned,
-                abs(hashtext(coalesce(r.cluster_id, r.code))) % 60 AS cluster_color_index,
-                COALESCE(c.color_index, abs(hashtext(coalesce(r.building_id, r.code))) % 60) AS building_color_index,
-                ST_AsMVTGeom(ST_Transform(p.geom, 3857), bounds.geom, 4096, 64, true) AS geom
-            FROM ml_point_results r
-            JOIN insar_points p
-              ON p.area_id = r.area_id
-             AND p.dataset_id = r.dataset_id
-             AND p.code = r.code
-             AND p.track = r.track
-            LEFT JOIN ml_building_colors c
-              ON c.run_id = r.run_id
-             AND c.area_id = r.area_id
-             AND c.building_source = r.building_source
-             AND c.building_id = r.building_id
-            JOIN bounds ON ST_Intersects(ST_Transform(p.geom, 3857), bounds.geom)
-            WHERE r.run_id = $4::uuid
-        )
-        SELECT ST_AsMVT(mvtgeom, 'ml_points', 4096, 'geom') AS mvt
-        FROM mvtgeom
-    """
-    row = await fetch_one(request.app, query, z, x, y, run_id)
-    if row is None or row["mvt"] is None:
-        raise HTTPException(status_code=404, detail="Tile not found")
-
-    return Response(
-        content=row["mvt"],
-        headers={
-            "Content-Type": "application/x-protobuf",
-            "Cache-Control": "no-store",
-        },
+async def ml_tiles(
+    request: Request,
+    run_id: str,
+    z: int,
+    x: int,
+    y: int,
+    profile: str | None = Query(default=None, description="Named attribute set: full, map or style"),
+    fields: str | None = Query(default=None, description="Comma-separated attribute names"),
+) -> Response:
+    return await _run_tile_response(
+        request, run_id, "points", z, x, y, ml_points_tile_query, profile, fields
     )
 
 
 @router.get("/runs/{run_id}/buildings/{z}/{x}/{y}.pbf")
-async def ml_buildings_tiles(request: Request, run_id: str, z: int, x: int, y: int) -> Response:
-    query = """
-        WITH bounds AS (
-            SELECT ST_TileEnvelope($1, $2, $3) AS geom
-        ),
-        building_rollups AS (
-            SELECT DISTINCT ON (area_id, building_source, building_id)
-                area_id,
-                building_source,
-                building_id,
-                (meta->'building_rollup'->>'building_motion_mm_a')::double precision AS building_motion_mm_a,
-                (meta->'building_rollup'->>'building_reliability_score')::double precision AS building_reliability_score,
-                (meta->'building_rollup'->>'building_reliability_band') AS building_reliability_band,
-                COALESCE((meta->'building_rollup'->>'weak_secondary_track_flag')::boolean, false)
-                    AS weak_secondary_track_flag,
-                COALESCE((meta->'building_rollup'->>'agreement_tension_flag')::boolean, false)
-                    AS agreement_tension_flag,
-                COALESCE((meta->'building_rollup'->'reliability_penalties')::text, '[]')
-                    AS reliability_penalties_json,
-                COALESCE((meta->'building_rollup'->>'differential_motion_flag')::boolean, false) AS differential_motion_flag,
-                (meta->'building_rollup'->>'building_status') AS building_status,
-                (meta->'building_rollup'->>'track_agreement_score')::double precision AS track_agreement_score,
-                (meta->'building_rollup'->>'cluster_count')::integer AS cluster_count,
-                (meta->'building_rollup'->>'reliable_cluster_count')::integer AS reliable_cluster_count,
-                (meta->'building_rollup'->>'point_count')::integer AS point_count,
-                (meta->'building_rollup'->>'kept_point_count')::integer AS kept_point_count,
-                (meta->'building_rollup'->>'noise_point_count')::integer AS noise_point_count,
-                (meta->'building_rollup'->>'excluded_point_count')::integer AS excluded_point_count,
-                COALESCE((meta->'building_rollup'->'main_cluster_by_track')::text, '{}')
-                    AS main_cluster_by_track_json,
-                COALESCE((meta->'building_rollup'->>'neighbour_context_available')::boolean, false)
-                    AS neighbour_context_available,
-                (meta->'building_rollup'->>'neighbour_candidate_building_count')::integer
-                    AS neighbour_candidate_building_count,
-                (meta->'building_rollup'->>'neighbour_misassignment_point_count')::integer
-                    AS neighbour_misassignment_point_count,
-                (meta->'building_rollup'->>'neighbour_misassignment_share')::double precision
-                    AS neighbour_misassignment_share,
-                COALESCE((meta->'building_rollup'->>'neighbour_event_flag')::boolean, false)
-                    AS neighbour_event_flag,
-                (meta->'building_rollup'->>'neighbour_event_score')::double precision
-                    AS neighbour_event_score,
-                (meta->'building_rollup'->>'neighbour_consistency_score')::double precision
-                    AS neighbour_consistency_score,
-                (meta->'building_rollup'->>'supporting_neighbour_count')::integer
-                    AS supporting_neighbour_count,
-                (meta->'building_rollup'->>'supporting_track_count')::integer
-                    AS supporting_track_count
-            FROM ml_point_results
-            WHERE run_id = $4::uuid
-              AND building_id IS NOT NULL
-            ORDER BY
-                area_id,
-                building_source,
-                building_id,
-                COALESCE((meta->'cluster_rollup'->>'cluster_rank')::integer, 999),
-                track,
-                code
-        ),
-        assigned_buildings AS (
-            SELECT DISTINCT area_id, building_source, building_id
-            FROM ml_point_results
-            WHERE run_id = $4::uuid AND building_id IS NOT NULL
-        ),
-        gba AS (
-            SELECT b.area_id,
-                   b.gba_id::text AS building_id,
-                   'gba'::text AS building_source,
-                   b.geom,
-                   b.height AS height_m
-            FROM gba_buildings b
-            JOIN assigned_buildings ab
-              ON ab.area_id = b.area_id
-             AND ab.building_source = 'gba'
-             AND ab.building_id = b.gba_id::text
-        ),
-        osm AS (
-            SELECT b.area_id,
-                   b.osm_id::text AS building_id,
-                   'osm'::text AS building_source,
-                   b.geom,
-                   NULL::double precision AS height_m
-            FROM osm_buildings b
-            JOIN assigned_buildings ab
-              ON ab.area_id = b.area_id
-             AND ab.building_source = 'osm'
-             AND ab.building_id = b.osm_id::text
-        ),
-        all_buildings AS (
-            SELECT * FROM gba
-            UNION ALL
-            SELECT * FROM osm
-        ),
-        mvtgeom AS (
-            SELECT
-                all_buildings.area_id,
-                all_buildings.building_id,
-                all_buildings.building_source,
-                height_m,
-                rollups.building_motion_mm_a,
-                rollups.building_reliability_score,
-                rollups.building_reliability_band,
-                rollups.weak_secondary_track_flag,
-                rollups.agreement_tension_flag,
-                rollups.reliability_penalties_json,
-                rollups.differential_motion_flag,
-                rollups.building_status,
-                rollups.track_agreement_score,
-                rollups.cluster_count,
-                rollups.reliable_cluster_count,
-                rollups.point_count,
-                rollups.kept_point_count,
-                rollups.noise_point_count,
-                rollups.excluded_point_count,
-                rollups.main_cluster_by_track_json,
-                rollups.neighbour_context_available,
-                rollups.neighbour_candidate_building_count,
-                rollups.neighbour_misassignment_point_count,
-                rollups.neighbour_misassignment_share,
-                rollups.neighbour_event_flag,
-                rollups.neighbour_event_score,
-                rollups.neighbour_consistency_score,
-                rollups.supporting_neighbour_count,
-                rollups.supporting_track_count,
-                COALESCE(
-                    c.color_index,
-                    abs(hashtext(all_buildings.area_id || ':' || all_buildings.building_id)) % 60
-                ) AS building_color_index,
-                ST_AsMVTGeom(
-                    ST_Transform(all_buildings.geom, 3857),
-                    bounds.geom,
-                    4096,
-                    64,
-                    true
-                ) AS geom
-            FROM all_buildings
-            LEFT JOIN ml_building_colors c
-              ON c.run_id = $4::uuid
-             AND c.area_id = all_buildings.area_id
-             AND c.building_source = all_buildings.building_source
-             AND c.building_id = all_buildings.building_id
-            LEFT JOIN building_rollups rollups
-              ON rollups.area_id = all_buildings.area_id
-             AND rollups.building_source = all_buildings.building_source
-             AND rollups.building_id = all_buildings.building_id
-            JOIN bounds ON ST_Intersects(ST_Transform(all_buildings.geom, 3857), bounds.geom)
-        )
-        SELECT ST_AsMVT(mvtgeom, 'ml_buildings', 4096, 'geom') AS mvt
-        FROM mvtgeom
-    """
-    row = await fetch_one(request.app, query, z, x, y, run_id)
-    if row is None or row["mvt"] is None:
-        raise HTTPException(status_code=404, detail="Tile not found")
-
-    return Response(
-        content=row["mvt"],
-        headers={
-            "Content-Type": "application/x-protobuf",
-            "Cache-Control": "no-store",
-        },
+async def ml_buildings_tiles(
+    request: Request,
+    run_id: str,
+    z: int,
+    x: int,
+    y: int,
+    profile: str | None = Query(default=None, description="Named attribute set: full, map or style"),
+    fields: str | None = Query(default=None, description="Comma-separated attribute names"),
+) -> Response:
+    return await _run_tile_response(
+        request, run_id, "buildings", z, x, y, ml_buildings_tile_query, profile, fields
     )
 
 
@@ -1443,9 +1352,13 @@ async def delete_run(
     async with request.app.state.db_pool.acquire() as conn:
         async with conn.transaction():
             await conn.execute("DELETE FROM ml_building_colors WHERE run_id = $1", run_id)
+            await conn.execute("DELETE FROM ml_run_buildings WHERE run_id = $1", run_id)
+            await conn.execute("DELETE FROM ml_point_tile_attrs WHERE run_id = $1", run_id)
             await conn.execute("DELETE FROM ml_point_results WHERE run_id = $1", run_id)
             await conn.execute("DELETE FROM ml_run_metrics WHERE run_id = $1", run_id)
             await conn.execute("DELETE FROM ml_runs WHERE run_id = $1", run_id)
+    drop_baked_tiles(run_id)
+    await request.app.state.ml_tile_cache.purge(run_id)
 
     return MLRunDeleteResponse(
         run_id=run_id,
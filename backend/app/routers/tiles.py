@@ -1,118 +1,327 @@
 from __future__ import annotations
 
-import os
-import sqlite3
-from functools import lru_cache
-from pathlib import Path
-from typing import Optional, Tuple
+import asyncio
+import secrets
+import struct
+from typing import AsyncIterator, List, Optional, Tuple
 
 from fastapi import APIRouter, HTTPException, Request, Response
+from fastapi.responses import JSONResponse, StreamingResponse
 
-from ..config import settings
+from ..http_cache import etag_for, etag_matches, not_modified
+from ..schemas import TileBatchRequest
+from ..tilestore import MBTilesReader, PMTilesArchive, TileCoordinateError
+from ..tilestore.encoding import can_transcode, negotiate_encoding, stored_encoding
+
+TILE_CACHE_CONTROL = "public, max-age=86400"
+
+# Batch records: zoom u8, x u32, y u32, byte length u32 (0 = no tile), tile bytes.
+_BATCH_RECORD = struct.Struct("<BIII")
 
 router = APIRouter(tags=["tiles"])
 
 
-def _parse_range(range_header: str, file_size: int) -> Optional[Tuple[int, int]]:
-    if not range_header or "=" not in range_header:
-        return None
-    units, _, range_spec = range_header.partition("=")
-    if units.strip().lower() != "bytes":
+# More parts than this are not worth a multipart response; the header is
+# ignored and the whole file is sent once instead.
+MAX_BYTE_RANGES = 16
+
+
+def _parse_range_spec(range_spec: str, file_size: int) -> Optional[Tuple[int, int]]:
+    # Raises ValueError for a malformed spec; None means it is unsatisfiable.
+    start_str, separator, end_str = range_spec.strip().partition("-")
+    if not separator:
+        raise ValueError(range_spec)
+    if start_str:
+        start = int(start_str)
+        end = int(end_str) if end_str else file_size - 1
+        if start < 0 or end < start:
+            raise ValueError(range_spec)
+    else:
+        # suffix length
+        suffix_len = int(end_str)
+        if suffix_len <= 0:
+            return None
+        start = max(0, file_size - suffix_len)
+        end = file_size - 1
+    if start >= file_size:
         return None
+    return start, min(end, file_size - 1)
+
 
-    start_str, _, end_str = range_spec.partition("-")
+def _parse_ranges(range_header: str, file_size: int) -> Optional[List[Tuple[int, int]]]:
+    # [] serves the whole file (no usable header); None is a 416.
+    if not range_header or "=" not in range_header:
+        return []
+    units, _, range_set = range_header.partition("=")
+    if units.strip().lower() != "bytes":
+        return []
+    range_specs = range_set.split(",")
+    if len(range_specs) > MAX_BYTE_RANGES:
+        return []
     try:
-        if start_str:
-            start = int(start_str)
-            end = int(end_str) if end_str else file_size - 1
-        else:
-            # suffix length
-            suffix_len = int(end_str)
-            start = max(0, file_size - suffix_len)
-            end = file_size - 1
+        parsed = [_parse_range_spec(range_spec, file_size) for range_spec in range_specs]
     except ValueError:
+        return []
+    satisfiable = sorted(byte_range for byte_range in parsed if byte_range is not None)
+    if not satisfiable:
         return None
+    # Overlapping and adjacent ranges are coalesced so no byte is sent twice.
+    ranges = [satisfiable[0]]
+    for start, end in satisfiable[1:]:
+        last_start, last_end = ranges[-1]
+        if start <= last_end + 1:
+            ranges[-1] = (last_start, max(last_end, end))
+        else:
+            ranges.append((start, end))
+    return ranges
+
+
+async def _iter_parts(parts: List[bytes | memoryview]) -> AsyncIterator[bytes | memoryview]:
+    for part in parts:
+        yield part
 
-    if start < 0 or end < start:
-        return None
-    end = min(end, file_size - 1)
-    return start, end
+
+def _multipart_ranges_response(
+    archive: PMTilesArchive,
+    byte_ranges: List[Tuple[int, int]],
+    headers: dict,
+) -> Response:
+    boundary = secrets.token_hex(16)
+    parts: List[bytes | memoryview] = []
+    for start, end in byte_ranges:
+        parts.append(
+            (
+                f"\r\n--{boundary}\r\n"
+                "Content-Type: application/octet-stream\r\n"
+                f"Content-Range: bytes {start}-{end}/{archive.size}\r\n\r\n"
+            ).encode("ascii")
+        )
+        parts.append(archive.slice(start, end))
+    parts.append(f"\r\n--{boundary}--\r\n".encode("ascii"))
+    headers["Content-Length"] = str(sum(len(part) for part in parts))
+    return StreamingResponse(
+        _iter_parts(parts),
+        status_code=206,
+        media_type=f"multipart/byteranges; boundary={boundary}",
+        headers=headers,
+    )
 
 
 @router.get("/pmtiles/{name}")
 async def pmtiles_file(name: str, request: Request) -> Response:
-    tiles_dir = settings.tiles_dir
-    path = tiles_dir / name
-
-    if not path.exists() or not path.is_file():
+    archive = request.app.state.pmtiles.archive(name)
+    if archive is None:
         raise HTTPException(status_code=404, detail="PMTiles not found")
 
-    file_size = os.path.getsize(path)
-    range_header = request.headers.get("range")
-    byte_range = _parse_range(range_header, file_size)
-
     headers = {
         "Accept-Ranges": "bytes",
-        "Cache-Control": "public, max-age=86400",
+        "Cache-Control": TILE_CACHE_CONTROL,
+        "ETag": etag_for(archive.name, *archive.signature),
     }
+    if etag_matches(request, headers["ETag"]):
+        return not_modified(headers)
+
+    byte_ranges = _parse_ranges(request.headers.get("range"), archive.size)
+
+    if byte_ranges is None:
+        headers["Content-Range"] = f"bytes */{archive.size}"
+        return Response(status_code=416, headers=headers)
 
-    if byte_range is None:
-        data = path.read_bytes()
-        return Response(content=data, media_type="application/octet-stream", headers=headers)
+    if not byte_ranges:
+        headers["Content-Length"] = str(archive.size)
+        return StreamingResponse(
+            archive.iter_chunks(),
+            media_type="application/octet-stream",
+            headers=headers,
+        )
 
-    start, end = byte_range
-    length = end - start + 1
-    with path.open("rb") as f:
-        f.seek(start)
-        data = f.read(length)
+    if len(byte_ranges) > 1:
+        return _multipart_ranges_response(archive, byte_ranges, headers)
 
-    headers.update({
-        "Content-Range": f"bytes {start}-{end}/{file_size}",
-        "Content-Length": str(length),
-    })
+    start, end = byte_ranges[0]
+    headers["Content-Range"] = f"bytes {start}-{end}/{archive.size}"
 
     return Response(
-        content=data,
+        content=archive.slice(start, end),
         status_code=206,
         media_type="application/octet-stream",
         headers=headers,
     )
 
 
-@lru_cache(maxsize=8)
-def _open_mbtiles(path: str) -> sqlite3.Connection:
-    conn = sqlite3.connect(path, check_same_thread=False)
-    return conn
+@router.get("/pmtiles/{name}/{z}/{x}/{y}.pbf")
+async def pmtiles_tile(request: Request, name: str, z: int, x: int, y: int) -> Response:
+    archive = request.app.state.pmtiles.archive(f"{name}.pmtiles")
+    if archive is None:
+        raise HTTPException(status_code=404, detail="PMTiles not found")
 
+    try:
+        header = archive.header
+    except ValueError as exc:
+        raise HTTPException(status_code=502, detail=str(exc)) from exc
 
-def _tms_y(z: int, y: int) -> int:
-    return (1 << z) - 1 - y
+    # Raster tiles are already compressed images; only vector tiles are renegotiated.
+    negotiable = header.tile_type == 1 and can_transcode(header.tile_encoding)
+    encoding = (
+        negotiate_encoding(request.headers.get("accept-encoding"))
+        if negotiable
+        else header.tile_encoding
+    )
+    cache_headers = {
+        "Cache-Control": TILE_CACHE_CONTROL,
+        "ETag": etag_for(archive.name, *archive.signature, z, x, y, encoding or "identity"),
+    }
+    if negotiable:
+        cache_headers["Vary"] = "Accept-Encoding"
+    if etag_matches(request, cache_headers["ETag"]):
+        return not_modified(cache_headers)
 
+    # Leaf directories are parsed and page faults on the mapping are taken off
+    # the event loop, like MBTiles reads.
+    loop = asyncio.get_running_loop()
+    try:
+        data = await loop.run_in_executor(request.app.state.tile_executor, archive.read_tile, z, x, y)
+    except TileCoordinateError as exc:
+        raise HTTPException(status_code=400, detail=str(exc)) from exc
+    except ValueError as exc:
+        # Corrupt directories or an unsupported compression in the archive.
+        raise HTTPException(status_code=502, detail=str(exc)) from exc
+    if data is None:
+        return Response(status_code=204, headers=cache_headers)
+
+    data = await request.app.state.tile_encoder.encode(
+        (archive.name, z, x, y),
+        archive.signature,
+        data,
+        header.tile_encoding,
+        encoding,
+    )
+    headers = {"Content-Type": header.tile_media_type, **cache_headers}
+    if encoding:
+        headers["Content-Encoding"] = encoding
+    return Response(content=data, headers=headers)
 
-@router.get("/mbtiles/{name}/{z}/{x}/{y}.pbf")
-async def mbtiles_tile(name: str, z: int, x: int, y: int) -> Response:
-    tiles_dir = settings.tiles_dir
-    path = tiles_dir / f"{name}.mbtiles"
 
-    if not path.exists() or not path.is_file():
+@router.get("/mbtiles/{name}/{z}/{x}/{y}.pbf")
+async def mbtiles_tile(request: Request, name: str, z: int, x: int, y: int) -> Response:
+    reader = request.app.state.mbtiles.reader(name)
+    if reader is None:
         raise HTTPException(status_code=404, detail="MBTiles not found")
+    return await mbtiles_tile_response(request, reader, z, x, y)
 
-    conn = _open_mbtiles(str(path))
-    tms_y = _tms_y(z, y)
-    cur = conn.execute(
-        "SELECT tile_data FROM tiles WHERE zoom_level=? AND tile_column=? AND tile_row=?",
-        (z, x, tms_y),
-    )
-    row = cur.fetchone()
-    if row is None:
+
+async def mbtiles_tile_response(
+    request: Request,
+    reader: MBTilesReader,
+    z: int,
+    x: int,
+    y: int,
+    cache_control: str = TILE_CACHE_CONTROL,
+) -> Response:
+    mbtiles = request.app.state.mbtiles
+    encoding = negotiate_encoding(request.headers.get("accept-encoding"))
+    cache_headers = {
+        "Cache-Control": cache_control,
+        "ETag": etag_for(reader.name, *reader.signature, z, x, y, encoding or "identity"),
+        "Vary": "Accept-Encoding",
+    }
+    if etag_matches(request, cache_headers["ETag"]):
+        return not_modified(cache_headers)
+
+    metadata = await mbtiles.metadata(reader)
+    if not metadata.contains(z, x, y):
+        return Response(status_code=204, headers=cache_headers)
+
+    data = await mbtiles.read_tile(reader, z, x, y)
+    if data is None:
         # Tippecanoe omits vector tiles that contain no features. MapLibre can
         # request those neighboring tiles during normal panning/initial load.
-        return Response(status_code=204, headers={"Cache-Control": "public, max-age=86400"})
+        return Response(status_code=204, headers=cache_headers)
+
+    data = await request.app.state.tile_encoder.encode(
+        (reader.name, z, x, y),
+        reader.signature,
+        data,
+        stored_encoding(data),
+        encoding,
+    )
+    headers = {"Content-Type": "application/x-protobuf", **cache_headers}
+    if encoding:
+        headers["Content-Encoding"] = encoding
+    return Response(content=data, headers=headers)
+
+
+@router.get("/mbtiles/{name}/tilejson.json")
+async def mbtiles_tilejson(request: Request, name: str) -> Response:
+    mbtiles = request.app.state.mbtiles
+    reader = mbtiles.reader(name)
+    if reader is None:
+        raise HTTPException(status_code=404, detail="MBTiles not found")
 
-    data = row[0]
     headers = {
-        "Content-Type": "application/x-protobuf",
-        "Content-Encoding": "gzip",
-        "Cache-Control": "public, max-age=86400",
+        "Cache-Control": "public, max-age=300",
+        "ETag": etag_for(reader.name, *reader.signature, str(request.base_url)),
+    }
+    if etag_matches(request, headers["ETag"]):
+        return not_modified(headers)
+
+    metadata = await mbtiles.metadata(reader)
+    base_url = str(request.base_url).rstrip("/")
+    tilejson = {
+        "tilejson": "3.0.0",
+        "name": metadata.name,
+        "scheme": "xyz",
+        "format": metadata.format,
+        "tiles": [f"{base_url}/mbtiles/{name}/{{z}}/{{x}}/{{y}}.pbf"],
+        "minzoom": metadata.minzoom,
+        "maxzoom": metadata.maxzoom,
+        "vector_layers": metadata.vector_layers,
+    }
+    if metadata.bounds is not None:
+        tilejson["bounds"] = list(metadata.bounds)
+    if metadata.center is not None:
+        tilejson["center"] = list(metadata.center)
+    if metadata.attribution:
+        tilejson["attribution"] = metadata.attribution
+    if metadata.description:
+        tilejson["description"] = metadata.description
+    return JSONResponse(tilejson, headers=headers)
+
+
+@router.post("/mbtiles/{name}/batch")
+async def mbtiles_batch(request: Request, name: str, payload: TileBatchRequest) -> Response:
+    mbtiles = request.app.state.mbtiles
+    reader = mbtiles.reader(name)
+    if reader is None:
+        raise HTTPException(status_code=404, detail="MBTiles not found")
+
+    coords = list(dict.fromkeys((tile.z, tile.x, tile.y) for tile in payload.tiles))
+    for z, x, y in coords:
+        if x >= 1 << z or y >= 1 << z:
+            raise HTTPException(status_code=400, detail=f"Tile {z}/{x}/{y} out of range")
+
+    metadata = await mbtiles.metadata(reader)
+    tiles = await mbtiles.read_tiles(
+        reader,
+        [coord for coord in coords if metadata.contains(*coord)],
+    )
+    parts: List[bytes] = []
+    for z, x, y in coords:
+        data = tiles.get((z, x, y)) or b""
+        parts.append(_BATCH_RECORD.pack(z, x, y, len(data)))
+        parts.append(data)
+    # Tile bytes are passed through as stored (gzip for Tippecanoe output).
+    return Response(
+        content=b"".join(parts),
+        media_type="application/octet-stream",
+        headers={"Cache-Control": "no-store", "X-Tile-Count": str(len(coords))},
+    )
+
+
+@router.get("/tiles/stats")
+async def tile_stats(request: Request) -> dict:
+    return {
+        "cache": request.app.state.tile_cache.stats(),
+        "mbtiles": request.app.state.mbtiles.stats(),
+        "ml_tiles": request.app.state.ml_tile_cache.stats(),
     }
-    return Response(content=data, headers=headers)
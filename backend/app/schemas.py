@@ -72,6 +72,42 @@ class TimeseriesResponse(BaseModel):
     measurements: List[TimeseriesPoint]
 
 
+class TimeseriesColumnsResponse(BaseModel):
+    area_id: str
+    dataset_id: str
+    sensor: str
+    code: str
+    track: int
+    epoch_days: List[int]
+    displacement: List[Optional[float]]
+    amplitude: List[Optional[float]]
+
+
+class TimeseriesKey(BaseModel):
+    dataset_id: str
+    code: str
+    track: int
+
+
+class TimeseriesBatchRequest(BaseModel):
+    points: List[TimeseriesKey] = Field(min_length=1, max_length=200)
+
+
+class TimeseriesBatchSeries(BaseModel):
+    area_id: str
+    dataset_id: str
+    code: str
+    track: int
+    epoch_days: List[int]
+    displacement: List[Optional[float]]
+    amplitude: List[Optional[float]]
+
+
+class TimeseriesBatchResponse(BaseModel):
+    series: List[TimeseriesBatchSeries]
+    missing: List[TimeseriesKey]
+
+
 class BuildingDetail(BaseModel):
     area_id: str
     id: str
@@ -95,6 +131,16 @@ class ConfigResponse(BaseModel):
     tracks: List[dict]
 
 
+class TileCoord(BaseModel):
+    z: int = Field(ge=0, le=30)
+    x: int = Field(ge=0)
+    y: int = Field(ge=0)
+
+
+class TileBatchRequest(BaseModel):
+    tiles: List[TileCoord] = Field(min_length=1, max_length=256)
+
+
 class MLRunCreate(BaseModel):
     pipeline: str
     area_id: Optional[str] = None
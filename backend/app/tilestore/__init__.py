@@ -0,0 +1,20 @@
+from .cache import TileCache
+from .encoding import TileEncoder
+from .mbtiles import MBTilesMetadata, MBTilesReader, MBTilesReaderPool
+from .pmtiles import PMTilesArchive, PMTilesArchivePool, TileCoordinateError
+from .runcache import RunTileCache
+from .stores import close_tile_stores, open_tile_stores
+
+__all__ = [
+    "MBTilesMetadata",
+    "MBTilesReader",
+    "MBTilesReaderPool",
+    "PMTilesArchive",
+    "PMTilesArchivePool",
+    "RunTileCache",
+    "TileCache",
+    "TileCoordinateError",
+    "TileEncoder",
+    "close_tile_stores",
+    "open_tile_stores",
+]
@@ -0,0 +1,133 @@
+from __future__ import annotations
+
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Hashable
+
+# Rough per-entry bookkeeping cost (key tuple, OrderedDict node, entry object).
+# Counting it keeps cached empty tiles from being free.
+ENTRY_OVERHEAD_BYTES = 128
+
+MISSING = object()
+
+
+@dataclass
+class _Entry:
+    data: Any
+    size: int
+
+
+@dataclass
+class _TilesetStats:
+    version: Hashable = None
+    bytes: int = 0
+    entries: int = 0
+    hits: int = 0
+    misses: int = 0
+    evictions: int = 0
+
+
+def _entry_size(data: Any) -> int:
+    if data is None:
+        return ENTRY_OVERHEAD_BYTES
+    return len(data) + ENTRY_OVERHEAD_BYTES
+
+
+class TileCache:
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max(0, max_bytes)
+        self._entries: OrderedDict[tuple, _Entry] = OrderedDict()
+        self._tilesets: dict[str, _TilesetStats] = {}
+        self._lock = threading.Lock()
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_bytes > 0
+
+    def _tileset(self, name: str, version: Hashable) -> _TilesetStats:
+        stats = self._tilesets.get(name)
+        if stats is None:
+            stats = self._tilesets[name] = _TilesetStats(version=version)
+        elif stats.version != version:
+            self._drop_tileset(name)
+            stats.version = version
+        return stats
+
+    def _drop_tileset(self, name: str) -> None:
+        keys = [key for key in self._entries if key[0] == name]
+        for key in keys:
+            self._remove(key)
+        if keys:
+            self.invalidations += 1
+
+    def _remove(self, key: tuple) -> _Entry:
+        entry = self._entries.pop(key)
+        stats = self._tilesets[key[0]]
+        stats.bytes -= entry.size
+        stats.entries -= 1
+        self.bytes -= entry.size
+        return entry
+
+    def get(self, key: tuple, version: Hashable) -> Any:
+        with self._lock:
+            stats = self._tileset(key[0], version)
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                stats.misses += 1
+                return MISSING
+            self._entries.move_to_end(key)
+            self.hits += 1
+            stats.hits += 1
+            return entry.data
+
+    def put(self, key: tuple, version: Hashable, data: Any) -> None:
+        size = _entry_size(data)
+        if not self.enabled or size > self.max_bytes:
+            return
+        with self._lock:
+            stats = self._tileset(key[0], version)
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = _Entry(data=data, size=size)
+            stats.bytes += size
+            stats.entries += 1
+            self.bytes += size
+            while self.bytes > self.max_bytes:
+                evicted_key = next(iter(self._entries))
+                self._remove(evicted_key)
+                self.evictions += 1
+                self._tilesets[evicted_key[0]].evictions += 1
+
+    def invalidate(self, name: str) -> None:
+        with self._lock:
+            if name in self._tilesets:
+                self._drop_tileset(name)
+
+    def stats(self) -> dict[str, Any]:
+        with self._lock:
+            return {
+                "max_bytes": self.max_bytes,
+                "bytes": self.bytes,
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+                "tilesets": {
+                    name: {
+                        "bytes": stats.bytes,
+                        "entries": stats.entries,
+                        "hits": stats.hits,
+                        "misses": stats.misses,
+                        "evictions": stats.evictions,
+                    }
+                    for name, stats in sorted(self._tilesets.items())
+                },
+            }
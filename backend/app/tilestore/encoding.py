@@ -0,0 +1,115 @@
+from __future__ import annotations
+
+import asyncio
+import gzip
+from concurrent.futures import Executor
+
+try:
+    import brotli  # type: ignore
+except ImportError:  # pragma: no cover - exercised in runtime environments without brotli wheels
+    brotli = None
+
+from .cache import MISSING, TileCache
+
+GZIP_MAGIC = b"\x1f\x8b"
+
+
+def stored_encoding(data: bytes | memoryview) -> str | None:
+    return "gzip" if bytes(data[:2]) == GZIP_MAGIC else None
+
+
+def _accept_encoding_weights(header: str) -> dict[str, float]:
+    weights: dict[str, float] = {}
+    for item in header.split(","):
+        coding, _, params = item.strip().partition(";")
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+        weight = 1.0
+        for param in params.split(";"):
+            key, _, value = param.strip().partition("=")
+            if key.strip().lower() == "q":
+                try:
+                    weight = float(value)
+                except ValueError:
+                    weight = 0.0
+        weights[coding] = weight
+    return weights
+
+
+def negotiate_encoding(accept_encoding: str | None) -> str | None:
+    if accept_encoding is None:
+        # No header means any coding is acceptable; keep the historic gzip default.
+        return "gzip"
+    weights = _accept_encoding_weights(accept_encoding)
+    wildcard = weights.get("*", 0.0)
+    if brotli is not None and weights.get("br", wildcard) > 0:
+        return "br"
+    if weights.get("gzip", wildcard) > 0:
+        return "gzip"
+    return None
+
+
+def can_transcode(encoding: str | None) -> bool:
+    if encoding == "br":
+        return brotli is not None
+    return encoding in (None, "gzip")
+
+
+def _decode(data: bytes, encoding: str | None) -> bytes:
+    if encoding == "gzip":
+        return gzip.decompress(data)
+    if encoding == "br":
+        return brotli.decompress(data)
+    return data
+
+
+def transcode(data: bytes, source: str | None, target: str | None, brotli_quality: int) -> bytes:
+    if source == target:
+        return data
+    raw = _decode(data, source)
+    if target is None:
+        return raw
+    if target == "gzip":
+        return gzip.compress(raw, compresslevel=6)
+    if target == "br":
+        return brotli.compress(raw, quality=brotli_quality)
+    raise ValueError(f"Unsupported tile encoding {target}")
+
+
+class TileEncoder:
+    def __init__(self, executor: Executor, cache: TileCache, brotli_quality: int):
+        self._executor = executor
+        self._cache = cache
+        self._brotli_quality = brotli_quality
+
+    async def encode(
+        self,
+        key: tuple,
+        version,
+        data: bytes | memoryview,
+        source: str | None,
+        target: str | None,
+    ) -> bytes | memoryview:
+        if source == target:
+            return data
+        # Identity variants are cheap to rebuild and several times larger than
+        # the compressed tile, so only compressed variants are kept.
+        cacheable = target is not None
+        variant_key = (*key, target)
+        if cacheable:
+            cached = self._cache.get(variant_key, version)
+            if cached is not MISSING:
+                return cached
+        loop = asyncio.get_running_loop()
+        encoded = await loop.run_in_executor(
+            self._executor,
+            transcode,
+            bytes(data),
+            source,
+            target,
+            self._brotli_quality,
+        )
+        if cacheable:
+            self._cache.put(variant_key, version, encoded)
+        return encoded
@@ -0,0 +1,65 @@
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import Any, Callable, Iterable
+
+# 2**25 bits keeps a single zoom bitmap at 4 MiB. Wider grids fall back to queries.
+MAX_INDEX_BITS_PER_ZOOM = 1 << 25
+
+
+@dataclass(frozen=True)
+class ZoomBitmap:
+    min_x: int
+    min_row: int
+    width: int
+    height: int
+    bits: bytearray
+
+    def contains(self, x: int, row: int) -> bool:
+        col = x - self.min_x
+        line = row - self.min_row
+        if not (0 <= col < self.width and 0 <= line < self.height):
+            return False
+        bit = line * self.width + col
+        return bool(self.bits[bit >> 3] & (1 << (bit & 7)))
+
+
+class TileIndex:
+    def __init__(self, zooms: dict[int, ZoomBitmap | None]):
+        self._zooms = zooms
+
+    def may_contain(self, z: int, x: int, row: int) -> bool:
+        if z not in self._zooms:
+            return False
+        bitmap = self._zooms[z]
+        if bitmap is None:
+            return True
+        return bitmap.contains(x, row)
+
+    def stats(self) -> dict[str, Any]:
+        bitmaps = [bitmap for bitmap in self._zooms.values() if bitmap is not None]
+        return {
+            "zooms": sorted(self._zooms),
+            "indexed_zooms": sorted(z for z, bitmap in self._zooms.items() if bitmap is not None),
+            "bytes": sum(len(bitmap.bits) for bitmap in bitmaps),
+        }
+
+
+def build_tile_index(
+    extents: Iterable[tuple[int, int, int, int, int]],
+    fetch_zoom: Callable[[int], Iterable[tuple[int, int]]],
+    max_bits: int = MAX_INDEX_BITS_PER_ZOOM,
+) -> TileIndex:
+    zooms: dict[int, ZoomBitmap | None] = {}
+    for z, min_x, max_x, min_row, max_row in extents:
+        width = max_x - min_x + 1
+        height = max_row - min_row + 1
+        if width * height > max_bits:
+            zooms[z] = None
+            continue
+        bits = bytearray((width * height + 7) // 8)
+        for x, row in fetch_zoom(z):
+            bit = (row - min_row) * width + (x - min_x)
+            bits[bit >> 3] |= 1 << (bit & 7)
+        zooms[z] = ZoomBitmap(min_x, min_row, width, height, bits)
+    return TileIndex(zooms)
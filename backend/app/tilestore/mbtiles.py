@@ -0,0 +1,296 @@
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+import math
+import os
+import queue
+import sqlite3
+import stat
+from concurrent.futures import Executor, Future
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Callable
+
+from .cache import MISSING, TileCache
+from .index import TileIndex, build_tile_index
+
+logger = logging.getLogger(__name__)
+
+METADATA_QUERY = "SELECT name, value FROM metadata"
+TILE_QUERY = "SELECT tile_data FROM tiles WHERE zoom_level=? AND tile_column=? AND tile_row=?"
+INDEX_EXTENT_QUERY = (
+    "SELECT zoom_level, MIN(tile_column), MAX(tile_column), MIN(tile_row), MAX(tile_row) "
+    "FROM tiles GROUP BY zoom_level"
+)
+INDEX_ZOOM_QUERY = "SELECT tile_column, tile_row FROM tiles WHERE zoom_level=?"
+BATCH_TILE_QUERY = (
+    "SELECT zoom_level, tile_column, tile_row, tile_data FROM tiles "
+    "WHERE (zoom_level, tile_column, tile_row) IN (VALUES {values})"
+)
+
+FileSignature = tuple[int, int, int]
+TileCoord = tuple[int, int, int]
+Bounds = tuple[float, float, float, float]
+
+MAX_MERCATOR_LAT = 85.0511287798066
+
+
+def tms_y(z: int, y: int) -> int:
+    return (1 << z) - 1 - y
+
+
+def tile_range(z: int, bounds: Bounds) -> tuple[int, int, int, int]:
+    west, south, east, north = bounds
+    size = 1 << z
+
+    def column(lon: float) -> int:
+        return min(size - 1, max(0, int((lon + 180.0) / 360.0 * size)))
+
+    def row(lat: float) -> int:
+        lat = max(-MAX_MERCATOR_LAT, min(MAX_MERCATOR_LAT, lat))
+        merc = math.asinh(math.tan(math.radians(lat)))
+        return min(size - 1, max(0, int((1.0 - merc / math.pi) / 2.0 * size)))
+
+    return column(west), row(north), column(east), row(south)
+
+
+@dataclass(frozen=True)
+class MBTilesMetadata:
+    name: str
+    format: str = "pbf"
+    minzoom: int = 0
+    maxzoom: int = 30
+    bounds: Bounds | None = None
+    center: tuple[float, ...] | None = None
+    attribution: str | None = None
+    description: str | None = None
+    vector_layers: list = field(default_factory=list)
+
+    def contains(self, z: int, x: int, y: int) -> bool:
+        if z < self.minzoom or z > self.maxzoom:
+            return False
+        if self.bounds is None:
+            return True
+        min_x, min_y, max_x, max_y = tile_range(z, self.bounds)
+        # Tippecanoe writes tile buffers into neighbouring tiles, so keep a one
+        # tile margin around the feature bounds.
+        return min_x - 1 <= x <= max_x + 1 and min_y - 1 <= y <= max_y + 1
+
+
+def _parse_floats(value: str | None, count: int) -> tuple[float, ...] | None:
+    if not value:
+        return None
+    try:
+        numbers = tuple(float(part) for part in value.split(","))
+    except ValueError:
+        return None
+    return numbers if len(numbers) >= count else None
+
+
+def parse_metadata(name: str, rows: list[tuple]) -> MBTilesMetadata:
+    values = {key: value for key, value in rows}
+    vector_layers = []
+    if values.get("json"):
+        try:
+            vector_layers = json.loads(values["json"]).get("vector_layers", [])
+        except (ValueError, AttributeError):
+            vector_layers = []
+    bounds = _parse_floats(values.get("bounds"), 4)
+    return MBTilesMetadata(
+        name=values.get("name") or name,
+        format=values.get("format") or "pbf",
+        minzoom=int(values.get("minzoom") or 0),
+        maxzoom=int(values.get("maxzoom") or 30),
+        bounds=bounds[:4] if bounds else None,
+        center=_parse_floats(values.get("center"), 2),
+        attribution=values.get("attribution"),
+        description=values.get("description"),
+        vector_layers=vector_layers,
+    )
+
+
+def file_signature(path: Path) -> FileSignature | None:
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    if not stat.S_ISREG(st.st_mode):
+        return None
+    return st.st_ino, st.st_size, st.st_mtime_ns
+
+
+class MBTilesReader:
+    def __init__(self, name: str, path: Path, signature: FileSignature):
+        self.name = name
+        self.path = path
+        self.signature = signature
+        # immutable=1 skips SQLite's locking and change detection entirely. That
+        # is safe because a replaced file gets a new signature and a new reader.
+        self._uri = f"{path.resolve().as_uri()}?mode=ro&immutable=1"
+        self._idle: queue.SimpleQueue[sqlite3.Connection] = queue.SimpleQueue()
+        self._closed = False
+        self.metadata: MBTilesMetadata | None = None
+        self.index: TileIndex | None = None
+
+    def _acquire(self) -> sqlite3.Connection:
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+        return sqlite3.connect(self._uri, uri=True, check_same_thread=False)
+
+    def _release(self, conn: sqlite3.Connection) -> None:
+        if self._closed:
+            conn.close()
+            return
+        self._idle.put(conn)
+
+    def execute(self, query: str, params: tuple = ()) -> list[tuple]:
+        conn = self._acquire()
+        try:
+            return conn.execute(query, params).fetchall()
+        finally:
+            self._release(conn)
+
+    def load_metadata(self) -> MBTilesMetadata:
+        if self.metadata is None:
+            try:
+                rows = self.execute(METADATA_QUERY)
+            except sqlite3.OperationalError:
+                rows = []
+            self.metadata = parse_metadata(self.name, rows)
+        return self.metadata
+
+    def load_index(self) -> TileIndex:
+        if self.index is None:
+            self.index = build_tile_index(
+                self.execute(INDEX_EXTENT_QUERY),
+                lambda z: self.execute(INDEX_ZOOM_QUERY, (z,)),
+            )
+        return self.index
+
+    def known_missing(self, z: int, x: int, y: int) -> bool:
+        # Until the index is built every tile counts as possibly present.
+        return self.index is not None and not self.index.may_contain(z, x, tms_y(z, y))
+
+    def read_tile(self, z: int, x: int, y: int) -> bytes | None:
+        rows = self.execute(TILE_QUERY, (z, x, tms_y(z, y)))
+        return rows[0][0] if rows else None
+
+    def read_tiles(self, coords: list[TileCoord]) -> dict[TileCoord, bytes]:
+        if not coords:
+            return {}
+        query = BATCH_TILE_QUERY.format(values=",".join(["(?,?,?)"] * len(coords)))
+        params = tuple(value for z, x, y in coords for value in (z, x, tms_y(z, y)))
+        return {
+            (z, x, tms_y(z, row)): data
+            for z, x, row, data in self.execute(query, params)
+        }
+
+    def close(self) -> None:
+        self._closed = True
+        while True:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            conn.close()
+
+
+def _log_index_failure(reader: MBTilesReader, future: Future) -> None:
+    exc = future.exception()
+    if exc is not None:
+        logger.warning("Could not build tile index for %s: %s", reader.path, exc)
+
+
+class MBTilesReaderPool:
+    def __init__(self, tiles_dir: Path, executor: Executor, cache: TileCache):
+        self.tiles_dir = tiles_dir
+        self.cache = cache
+        self._executor = executor
+        self._readers: dict[str, MBTilesReader] = {}
+
+    def path_for(self, name: str) -> Path:
+        return self.tiles_dir / f"{name}.mbtiles"
+
+    def reader(self, name: str) -> MBTilesReader | None:
+        path = self.path_for(name)
+        signature = file_signature(path)
+        current = self._readers.get(name)
+        if current is not None and current.signature == signature:
+            return current
+        if current is not None:
+            del self._readers[name]
+            current.close()
+            self.cache.invalidate(name)
+        if signature is None:
+            return None
+        reader = MBTilesReader(name, path, signature)
+        self._readers[name] = reader
+        self._executor.submit(reader.load_index).add_done_callback(
+            lambda future: _log_index_failure(reader, future)
+        )
+        return reader
+
+    def warm(self) -> list[str]:
+        return [
+            path.stem
+            for path in sorted(self.tiles_dir.glob("*.mbtiles"))
+            if self.reader(path.stem) is not None
+        ]
+
+    async def run(self, func: Callable[..., Any], *args) -> Any:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, func, *args)
+
+    async def metadata(self, reader: MBTilesReader) -> MBTilesMetadata:
+        if reader.metadata is not None:
+            return reader.metadata
+        return await self.run(reader.load_metadata)
+
+    async def read_tile(self, reader: MBTilesReader, z: int, x: int, y: int) -> bytes | None:
+        if reader.known_missing(z, x, y):
+            return None
+        key = (reader.name, z, x, y)
+        data = self.cache.get(key, reader.signature)
+        if data is MISSING:
+            data = await self.run(reader.read_tile, z, x, y)
+            self.cache.put(key, reader.signature, data)
+        return data
+
+    async def read_tiles(
+        self,
+        reader: MBTilesReader,
+        coords: list[TileCoord],
+    ) -> dict[TileCoord, bytes | None]:
+        tiles: dict[TileCoord, bytes | None] = {}
+        pending = []
+        for z, x, y in coords:
+            if reader.known_missing(z, x, y):
+                tiles[(z, x, y)] = None
+                continue
+            data = self.cache.get((reader.name, z, x, y), reader.signature)
+            if data is MISSING:
+                pending.append((z, x, y))
+            else:
+                tiles[(z, x, y)] = data
+        if pending:
+            found = await self.run(reader.read_tiles, pending)
+            for coord in pending:
+                data = found.get(coord)
+                self.cache.put((reader.name, *coord), reader.signature, data)
+                tiles[coord] = data
+        return tiles
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            name: {"index": reader.index.stats() if reader.index is not None else None}
+            for name, reader in sorted(self._readers.items())
+        }
+
+    def close(self) -> None:
+        for reader in self._readers.values():
+            reader.close()
+        self._readers.clear()
@@ -0,0 +1,313 @@
+from __future__ import annotations
+
+import gzip
+import mmap
+import struct
+import threading
+from bisect import bisect_right
+from collections import OrderedDict
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Iterator
+
+try:
+    import brotli  # type: ignore
+except ImportError:  # pragma: no cover - brotli is only needed for brotli-compressed archives
+    brotli = None
+
+from .mbtiles import FileSignature, file_signature
+
+STREAM_CHUNK_BYTES = 1024 * 1024
+HEADER_BYTES = 127
+MAX_DIRECTORY_DEPTH = 4
+MAX_CACHED_LEAF_DIRECTORIES = 256
+
+COMPRESSION_ENCODINGS = {1: None, 2: "gzip", 3: "br", 4: "zstd"}
+TILE_MEDIA_TYPES = {
+    1: "application/x-protobuf",
+    2: "image/png",
+    3: "image/jpeg",
+    4: "image/webp",
+    5: "image/avif",
+}
+
+_HEADER_STRUCT = struct.Struct("<7sB11Q6B4iB2i")
+
+
+@dataclass(frozen=True)
+class PMTilesHeader:
+    root_offset: int
+    root_length: int
+    metadata_offset: int
+    metadata_length: int
+    leaf_directory_offset: int
+    leaf_directory_length: int
+    tile_data_offset: int
+    tile_data_length: int
+    internal_compression: int
+    tile_compression: int
+    tile_type: int
+    min_zoom: int
+    max_zoom: int
+    bounds: tuple[float, float, float, float]
+
+    @property
+    def tile_encoding(self) -> str | None:
+        return COMPRESSION_ENCODINGS.get(self.tile_compression)
+
+    @property
+    def tile_media_type(self) -> str:
+        return TILE_MEDIA_TYPES.get(self.tile_type, "application/octet-stream")
+
+
+@dataclass(frozen=True)
+class PMTilesDirectory:
+    tile_ids: list[int]
+    run_lengths: list[int]
+    offsets: list[int]
+    lengths: list[int]
+
+    def find(self, tile_id: int) -> int | None:
+        index = bisect_right(self.tile_ids, tile_id) - 1
+        if index < 0:
+            return None
+        run_length = self.run_lengths[index]
+        if self.tile_ids[index] == tile_id or run_length == 0:
+            return index
+        if tile_id - self.tile_ids[index] < run_length:
+            return index
+        return None
+
+
+def parse_header(data: bytes | memoryview) -> PMTilesHeader:
+    if len(data) < HEADER_BYTES:
+        raise ValueError("PMTiles header is truncated")
+    fields = _HEADER_STRUCT.unpack_from(data)
+    magic, version = fields[0], fields[1]
+    if magic != b"PMTiles" or version != 3:
+        raise ValueError("Only PMTiles v3 archives are supported")
+    (
+        root_offset,
+        root_length,
+        metadata_offset,
+        metadata_length,
+        leaf_directory_offset,
+        leaf_directory_length,
+        tile_data_offset,
+        tile_data_length,
+    ) = fields[2:10]
+    internal_compression, tile_compression, tile_type, min_zoom, max_zoom = fields[14:19]
+    min_lon_e7, min_lat_e7, max_lon_e7, max_lat_e7 = fields[19:23]
+    return PMTilesHeader(
+        root_offset=root_offset,
+        root_length=root_length,
+        metadata_offset=metadata_offset,
+        metadata_length=metadata_length,
+        leaf_directory_offset=leaf_directory_offset,
+        leaf_directory_length=leaf_directory_length,
+        tile_data_offset=tile_data_offset,
+        tile_data_length=tile_data_length,
+        internal_compression=internal_compression,
+        tile_compression=tile_compression,
+        tile_type=tile_type,
+        min_zoom=min_zoom,
+        max_zoom=max_zoom,
+        bounds=(min_lon_e7 / 1e7, min_lat_e7 / 1e7, max_lon_e7 / 1e7, max_lat_e7 / 1e7),
+    )
+
+
+def _decompress(data: bytes | memoryview, compression: int) -> bytes:
+    if compression in (0, 1):
+        return bytes(data)
+    if compression == 2:
+        return gzip.decompress(data)
+    if compression == 3 and brotli is not None:
+        return brotli.decompress(bytes(data))
+    raise ValueError(f"Unsupported PMTiles internal compression {compression}")
+
+
+def _read_varints(data: bytes, pos: int, count: int) -> tuple[list[int], int]:
+    values = []
+    for _ in range(count):
+        value = 0
+        shift = 0
+        while True:
+            byte = data[pos]
+            pos += 1
+            value |= (byte & 0x7F) << shift
+            if byte < 0x80:
+                break
+            shift += 7
+        values.append(value)
+    return values, pos
+
+
+def parse_directory(data: bytes) -> PMTilesDirectory:
+    (count,), pos = _read_varints(data, 0, 1)
+    deltas, pos = _read_varints(data, pos, count)
+    run_lengths, pos = _read_varints(data, pos, count)
+    lengths, pos = _read_varints(data, pos, count)
+    raw_offsets, pos = _read_varints(data, pos, count)
+
+    tile_ids = []
+    last_id = 0
+    for delta in deltas:
+        last_id += delta
+        tile_ids.append(last_id)
+
+    offsets = []
+    for index, raw_offset in enumerate(raw_offsets):
+        if raw_offset == 0 and index > 0:
+            offsets.append(offsets[index - 1] + lengths[index - 1])
+        else:
+            offsets.append(raw_offset - 1)
+    return PMTilesDirectory(tile_ids, run_lengths, offsets, lengths)
+
+
+class TileCoordinateError(ValueError):
+    pass
+
+
+def zxy_to_tile_id(z: int, x: int, y: int) -> int:
+    if z < 0 or z > 31:
+        raise TileCoordinateError("Zoom level out of range")
+    size = 1 << z
+    if not (0 <= x < size and 0 <= y < size):
+        raise TileCoordinateError("Tile coordinates out of range")
+    tile_id = ((1 << (2 * z)) - 1) // 3
+    level = z - 1
+    while level >= 0:
+        s = 1 << level
+        rx = 1 if x & s else 0
+        ry = 1 if y & s else 0
+        tile_id += ((3 * rx) ^ ry) << (2 * level)
+        if ry == 0:
+            if rx == 1:
+                x = s - 1 - (x & (s - 1))
+                y = s - 1 - (y & (s - 1))
+            x, y = y, x
+        level -= 1
+    return tile_id
+
+
+class PMTilesArchive:
+    def __init__(self, name: str, path: Path, signature: FileSignature):
+        self.name = name
+        self.path = path
+        self.signature = signature
+        self.size = signature[1]
+        self._mmap: mmap.mmap | None = None
+        self._view = memoryview(b"")
+        if self.size > 0:
+            with path.open("rb") as handle:
+                self._mmap = mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ)
+            self._view = memoryview(self._mmap)
+        self._header: PMTilesHeader | None = None
+        self._root: PMTilesDirectory | None = None
+        # Tiles are read on the tile executor, so the leaf LRU is shared
+        # between threads.
+        self._leaves: OrderedDict[tuple[int, int], PMTilesDirectory] = OrderedDict()
+        self._leaves_lock = threading.Lock()
+
+    @property
+    def header(self) -> PMTilesHeader:
+        if self._header is None:
+            self._header = parse_header(self._view[:HEADER_BYTES])
+        return self._header
+
+    def _read_directory(self, offset: int, length: int) -> PMTilesDirectory:
+        raw = self._view[offset : offset + length]
+        return parse_directory(_decompress(raw, self.header.internal_compression))
+
+    def _root_directory(self) -> PMTilesDirectory:
+        if self._root is None:
+            self._root = self._read_directory(self.header.root_offset, self.header.root_length)
+        return self._root
+
+    def _leaf_directory(self, offset: int, length: int) -> PMTilesDirectory:
+        key = (offset, length)
+        with self._leaves_lock:
+            directory = self._leaves.get(key)
+            if directory is not None:
+                self._leaves.move_to_end(key)
+                return directory
+        directory = self._read_directory(self.header.leaf_directory_offset + offset, length)
+        with self._leaves_lock:
+            self._leaves[key] = directory
+            if len(self._leaves) > MAX_CACHED_LEAF_DIRECTORIES:
+                self._leaves.popitem(last=False)
+        return directory
+
+    def read_tile(self, z: int, x: int, y: int) -> memoryview | None:
+        header = self.header
+        if z < header.min_zoom or z > header.max_zoom:
+            return None
+        tile_id = zxy_to_tile_id(z, x, y)
+        directory = self._root_directory()
+        for _ in range(MAX_DIRECTORY_DEPTH):
+            index = directory.find(tile_id)
+            if index is None:
+                return None
+            offset = directory.offsets[index]
+            length = directory.lengths[index]
+            if directory.run_lengths[index] == 0:
+                directory = self._leaf_directory(offset, length)
+                continue
+            start = header.tile_data_offset + offset
+            return self._view[start : start + length]
+        return None
+
+    def slice(self, start: int, end: int) -> memoryview:
+        return self._view[start : end + 1]
+
+    def iter_chunks(
+        self,
+        start: int = 0,
+        end: int | None = None,
+        chunk_size: int = STREAM_CHUNK_BYTES,
+    ) -> Iterator[memoryview]:
+        end = self.size - 1 if end is None else end
+        # The span is sliced now rather than on first iteration. It holds its
+        # own reference to the mapping, so the stream stays readable even if
+        # the archive is closed before or while the response is sent.
+        span = self.slice(start, end)
+        return (span[offset : offset + chunk_size] for offset in range(0, len(span), chunk_size))
+
+    def close(self) -> None:
+        if self._mmap is None:
+            return
+        try:
+            self._view.release()
+            self._mmap.close()
+        except BufferError:
+            # Responses still hold slices of the mapping. It is unmapped once the
+            # last slice is garbage collected.
+            pass
+
+
+class PMTilesArchivePool:
+    def __init__(self, tiles_dir: Path):
+        self.tiles_dir = tiles_dir
+        self._archives: dict[str, PMTilesArchive] = {}
+
+    def archive(self, name: str) -> PMTilesArchive | None:
+        path = self.tiles_dir / name
+        signature = file_signature(path)
+        current = self._archives.get(name)
+        if current is not None and current.signature == signature:
+            return current
+        if current is not None:
+            # Requests may still hold the superseded archive between awaits, so
+            # it is not closed here. Dropping the pool's reference unmaps the
+            # old file once the last of those requests and their slices is done.
+            del self._archives[name]
+        if signature is None:
+            return None
+        archive = PMTilesArchive(name, path, signature)
+        self._archives[name] = archive
+        return archive
+
+    def close(self) -> None:
+        for archive in self._archives.values():
+            archive.close()
+        self._archives.clear()
@@ -0,0 +1,252 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import sqlite3
+import threading
+from concurrent.futures import Executor
+from pathlib import Path
+from typing import Any
+
+from .cache import MISSING, TileCache
+from .mbtiles import tms_y
+
+logger = logging.getLogger(__name__)
+
+# Bump when the generated run tiles or the disk layout change shape so stale
+# disk entries are dropped.
+RUN_TILE_CACHE_VERSION = 3
+
+# Once the disk tier passes its cap, the oldest tiles are evicted until it is
+# back under this share of the cap, so eviction does not run on every put.
+DISK_EVICT_TARGET = 0.9
+DISK_EVICT_BATCH = 512
+
+RUN_TILE_CACHE_METADATA = "CREATE TABLE IF NOT EXISTS metadata (name TEXT PRIMARY KEY, value TEXT)"
+
+# A rowid table: rowids grow with insertion order, which is the eviction order.
+RUN_TILE_CACHE_SCHEMA = (
+    """
+    CREATE TABLE IF NOT EXISTS tiles (
+        run_id TEXT NOT NULL,
+        layer TEXT NOT NULL,
+        zoom_level INTEGER NOT NULL,
+        tile_column INTEGER NOT NULL,
+        tile_row INTEGER NOT NULL,
+        tile_data BLOB NOT NULL
+    )
+    """,
+    """
+    CREATE UNIQUE INDEX IF NOT EXISTS tiles_key
+        ON tiles (run_id, layer, zoom_level, tile_column, tile_row)
+    """,
+)
+
+RUN_TILE_QUERY = """
+    SELECT tile_data FROM tiles
+    WHERE run_id = ? AND layer = ? AND zoom_level = ? AND tile_column = ? AND tile_row = ?
+"""
+
+# Writes within one generation render the same bytes, so a tile that is
+# already stored is kept rather than replaced.
+RUN_TILE_INSERT = """
+    INSERT OR IGNORE INTO tiles (run_id, layer, zoom_level, tile_column, tile_row, tile_data)
+    VALUES (?, ?, ?, ?, ?, ?)
+"""
+
+RUN_TILE_OLDEST_QUERY = """
+    SELECT rowid, length(tile_data) FROM tiles
+    WHERE rowid > ?
+    ORDER BY rowid
+    LIMIT ?
+"""
+
+
+def _open_disk_cache(path: Path, variant: str) -> sqlite3.Connection:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute(RUN_TILE_CACHE_METADATA)
+    row = conn.execute("SELECT value FROM metadata WHERE name = 'variant'").fetchone()
+    if row is None or row[0] != variant:
+        conn.execute("DROP TABLE IF EXISTS tiles")
+        conn.execute("INSERT OR REPLACE INTO metadata (name, value) VALUES ('variant', ?)", (variant,))
+    for statement in RUN_TILE_CACHE_SCHEMA:
+        conn.execute(statement)
+    return conn
+
+
+class RunTileCache:
+    def __init__(
+        self,
+        path: Path | None,
+        executor: Executor,
+        memory: TileCache,
+        variant: str,
+        disk_max_bytes: int,
+    ):
+        self.path = path
+        self.disk_max_bytes = max(0, disk_max_bytes)
+        self._executor = executor
+        self._memory = memory
+        self._lock = threading.Lock()
+        self._generations: dict[str, int] = {}
+        self._settled: set[str] = set()
+        self._conn: sqlite3.Connection | None = None
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.bypasses = 0
+        self.writes = 0
+        self.purges = 0
+        self.disk_bytes = 0
+        self.disk_tiles = 0
+        self.disk_evictions = 0
+        if path is not None and self.disk_max_bytes > 0:
+            try:
+                self._conn = _open_disk_cache(path, f"{RUN_TILE_CACHE_VERSION}:{variant}")
+                self.disk_bytes, self.disk_tiles = self._conn.execute(
+                    "SELECT COALESCE(SUM(length(tile_data)), 0), COUNT(*) FROM tiles"
+                ).fetchone()
+            except sqlite3.Error as exc:
+                logger.warning("Run tile disk cache disabled (%s): %s", path, exc)
+                self._conn = None
+
+    @staticmethod
+    def _tileset(run_id: str) -> str:
+        return f"runs:{run_id}"
+
+    async def _run(self, func, *args) -> Any:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, func, *args)
+
+    def generation(self, run_id: str) -> int:
+        with self._lock:
+            return self._generations.get(run_id, 0)
+
+    def settled(self, run_id: str) -> bool:
+        return run_id in self._settled
+
+    def mark_settled(self, run_id: str, generation: int) -> None:
+        with self._lock:
+            if self._generations.get(run_id, 0) == generation:
+                self._settled.add(run_id)
+
+    def bypass(self) -> None:
+        self.bypasses += 1
+
+    def _read(self, run_id: str, layer: str, z: int, x: int, y: int) -> bytes | None:
+        with self._lock:
+            row = self._conn.execute(RUN_TILE_QUERY, (run_id, layer, z, x, tms_y(z, y))).fetchone()
+        return bytes(row[0]) if row is not None else None
+
+    def _write(self, run_id: str, layer: str, z: int, x: int, y: int, generation: int, data: bytes) -> None:
+        with self._lock:
+            if self._generations.get(run_id, 0) != generation:
+                return
+            cursor = self._conn.execute(RUN_TILE_INSERT, (run_id, layer, z, x, tms_y(z, y), data))
+            if cursor.rowcount == 1:
+                self.disk_bytes += len(data)
+                self.disk_tiles += 1
+            if self.disk_bytes > self.disk_max_bytes:
+                self._evict()
+
+    def _evict(self) -> None:
+        # Oldest-first: hot tiles are also held by the in-memory LRU, so the
+        # disk tier only needs to keep the most recent renders.
+        target = int(self.disk_max_bytes * DISK_EVICT_TARGET)
+        last_rowid = 0
+        freed = evicted = 0
+        while self.disk_bytes - freed > target:
+            rows = self._conn.execute(RUN_TILE_OLDEST_QUERY, (last_rowid, DISK_EVICT_BATCH)).fetchall()
+            if not rows:
+                break
+            for rowid, size in rows:
+                last_rowid = rowid
+                freed += size
+                evicted += 1
+                if self.disk_bytes - freed <= target:
+                    break
+        self._conn.execute("DELETE FROM tiles WHERE rowid <= ?", (last_rowid,))
+        self.disk_bytes -= freed
+        self.disk_tiles -= evicted
+        self.disk_evictions += evicted
+
+    def _delete(self, run_id: str) -> None:
+        with self._lock:
+            size, count = self._conn.execute(
+                "SELECT COALESCE(SUM(length(tile_data)), 0), COUNT(*) FROM tiles WHERE run_id = ?",
+                (run_id,),
+            ).fetchone()
+            self._conn.execute("DELETE FROM tiles WHERE run_id = ?", (run_id,))
+            self.disk_bytes -= size
+            self.disk_tiles -= count
+
+    async def get(self, run_id: str, layer: str, z: int, x: int, y: int) -> bytes | None:
+        generation = self.generation(run_id)
+        key = (self._tileset(run_id), layer, z, x, y)
+        data = self._memory.get(key, generation)
+        if data is not MISSING:
+            self.memory_hits += 1
+            return data
+        if self._conn is not None:
+            data = await self._run(self._read, run_id, layer, z, x, y)
+            if data is not None:
+                self.disk_hits += 1
+                self._memory.put(key, generation, data)
+                return data
+        self.misses += 1
+        return None
+
+    async def put(
+        self,
+        run_id: str,
+        layer: str,
+        z: int,
+        x: int,
+        y: int,
+        generation: int,
+        data: bytes,
+    ) -> None:
+        if self.generation(run_id) != generation:
+            return
+        self._memory.put((self._tileset(run_id), layer, z, x, y), generation, data)
+        if self._conn is not None:
+            await self._run(self._write, run_id, layer, z, x, y, generation, data)
+        self.writes += 1
+
+    async def purge(self, run_id: str) -> None:
+        # Bumping the generation first rejects writes from renders that
+        # started before the purge.
+        with self._lock:
+            self._generations[run_id] = self._generations.get(run_id, 0) + 1
+            self._settled.discard(run_id)
+        self._memory.invalidate(self._tileset(run_id))
+        if self._conn is not None:
+            await self._run(self._delete, run_id)
+        self.purges += 1
+
+    def stats(self) -> dict[str, Any]:
+        lookups = self.memory_hits + self.disk_hits + self.misses
+        return {
+            "path": str(self.path) if self._conn is not None else None,
+            "memory_hits": self.memory_hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "hit_ratio": round((self.memory_hits + self.disk_hits) / lookups, 4) if lookups else None,
+            "bypasses": self.bypasses,
+            "writes": self.writes,
+            "purges": self.purges,
+            "disk_bytes": self.disk_bytes,
+            "disk_max_bytes": self.disk_max_bytes,
+            "disk_tiles": self.disk_tiles,
+            "disk_evictions": self.disk_evictions,
+            "settled_runs": len(self._settled),
+        }
+
+    def close(self) -> None:
+        if self._conn is not None:
+            with self._lock:
+                self._conn.close()
+            self._conn = None
@@ -0,0 +1,53 @@
+from __future__ import annotations
+
+from concurrent.futures import ThreadPoolExecutor
+
+from fastapi import FastAPI
+
+from ..config import settings
+from .cache import TileCache
+from .encoding import TileEncoder
+from .mbtiles import MBTilesReaderPool
+from .pmtiles import PMTilesArchivePool
+from .runcache import RunTileCache
+
+
+def open_tile_stores(app: FastAPI) -> None:
+    app.state.tile_executor = ThreadPoolExecutor(
+        max_workers=max(1, settings.mbtiles_reader_threads),
+        thread_name_prefix="tilestore",
+    )
+    app.state.tile_cache = TileCache(settings.tile_cache_mb * 1024 * 1024)
+    app.state.mbtiles = MBTilesReaderPool(
+        settings.tiles_dir,
+        app.state.tile_executor,
+        app.state.tile_cache,
+    )
+    app.state.pmtiles = PMTilesArchivePool(settings.tiles_dir)
+    app.state.tile_encoder = TileEncoder(
+        app.state.tile_executor,
+        app.state.tile_cache,
+        settings.tile_brotli_quality,
+    )
+    app.state.ml_tile_cache = RunTileCache(
+        settings.ml_tile_cache_path,
+        app.state.tile_executor,
+        app.state.tile_cache,
+        f"aggregate:{settings.ml_tile_aggregate_max_zoom}:{settings.ml_tile_aggregate_cells}",
+        settings.ml_tile_cache_disk_mb * 1024 * 1024,
+    )
+
+
+def close_tile_stores(app: FastAPI) -> None:
+    mbtiles = getattr(app.state, "mbtiles", None)
+    if mbtiles:
+        mbtiles.close()
+    pmtiles = getattr(app.state, "pmtiles", None)
+    if pmtiles:
+        pmtiles.close()
+    ml_tile_cache = getattr(app.state, "ml_tile_cache", None)
+    if ml_tile_cache:
+        ml_tile_cache.close()
+    executor = getattr(app.state, "tile_executor", None)
+    if executor:
+        executor.shutdown(wait=False, cancel_futures=True)
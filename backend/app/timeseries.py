@@ -0,0 +1,283 @@
+from __future__ import annotations
+
+import asyncio
+import struct
+from dataclasses import dataclass
+from itertools import groupby
+
+import numpy as np
+from fastapi import FastAPI
+
+from .db import fetch_all, fetch_one
+
+TIMESERIES_BINARY_MEDIA_TYPE = "application/octet-stream"
+
+# Both tables are keyed (area_id, dataset_id, code, track, date), so each fetch
+# is a single ordered primary-key range scan.
+DISPLACEMENT_COLUMN_QUERY = """
+    SELECT date, displacement
+    FROM insar_timeseries
+    WHERE area_id = $1 AND dataset_id = $2 AND code = $3 AND track = $4
+    ORDER BY date
+"""
+
+AMPLITUDE_COLUMN_QUERY = """
+    SELECT date, amplitude
+    FROM insar_amplitude_timeseries
+    WHERE area_id = $1 AND dataset_id = $2 AND code = $3 AND track = $4
+    ORDER BY date
+"""
+
+# Packed rows hold both series aligned with their track's date vector, so one
+# primary-key lookup replaces the two range scans below when the point is packed.
+PACKED_COLUMN_QUERY = """
+    SELECT v.dates, s.displacement, s.amplitude
+    FROM insar_timeseries_packed s
+    JOIN insar_timeseries_dates v
+      ON v.area_id = s.area_id
+     AND v.dataset_id = s.dataset_id
+     AND v.track = s.track
+    WHERE s.area_id = $1 AND s.dataset_id = $2 AND s.code = $3 AND s.track = $4
+"""
+
+PACKED_BATCH_QUERY = """
+    SELECT v.dates, s.displacement, s.amplitude, s.area_id, s.dataset_id, s.code, s.track
+    FROM unnest($1::text[], $2::text[], $3::text[], $4::int[]) AS k(area_id, dataset_id, code, track)
+    JOIN insar_timeseries_packed s
+      ON s.area_id = k.area_id
+     AND s.dataset_id = k.dataset_id
+     AND s.code = k.code
+     AND s.track = k.track
+    JOIN insar_timeseries_dates v
+      ON v.area_id = s.area_id
+     AND v.dataset_id = s.dataset_id
+     AND v.track = s.track
+"""
+
+# Batch keys arrive as parallel arrays; the join against unnest() probes the
+# primary key once per requested point in a single statement per table.
+_BATCH_QUERY = """
+    SELECT t.date, t.{value}, t.area_id, t.dataset_id, t.code, t.track
+    FROM unnest($1::text[], $2::text[], $3::text[], $4::int[]) AS k(area_id, dataset_id, code, track)
+    JOIN {table} t
+      ON t.area_id = k.area_id
+     AND t.dataset_id = k.dataset_id
+     AND t.code = k.code
+     AND t.track = k.track
+    ORDER BY t.area_id, t.dataset_id, t.code, t.track, t.date
+"""
+
+DISPLACEMENT_BATCH_QUERY = _BATCH_QUERY.format(value="displacement", table="insar_timeseries")
+AMPLITUDE_BATCH_QUERY = _BATCH_QUERY.format(value="amplitude", table="insar_amplitude_timeseries")
+
+# Binary layout, little-endian: uint32 epoch count n, then int32 days since
+# 1970-01-01 [n], float32 displacement [n], float32 amplitude [n]; NaN = missing.
+# Only the binary layout narrows to float32; JSON keeps the stored doubles.
+_COUNT = struct.Struct("<I")
+
+
+@dataclass(frozen=True)
+class TimeseriesColumns:
+    epoch_days: np.ndarray
+    displacement: np.ndarray
+    amplitude: np.ndarray
+
+    def __len__(self) -> int:
+        return len(self.epoch_days)
+
+
+def _epoch_days(dates) -> np.ndarray:
+    return np.array(dates, dtype="datetime64[D]").astype(np.int32)
+
+
+def merge_columns(displacement_rows, amplitude_rows) -> TimeseriesColumns:
+    # Rows are (date, value) pairs ordered by date; the union of both date sets
+    # replaces the FULL OUTER JOIN the row layout runs in SQL.
+    displacement_days = _epoch_days([row[0] for row in displacement_rows])
+    amplitude_days = _epoch_days([row[0] for row in amplitude_rows])
+    epoch_days = np.union1d(displacement_days, amplitude_days).astype(np.int32)
+
+    displacement = np.full(epoch_days.shape, np.nan, dtype=np.float64)
+    displacement[np.searchsorted(epoch_days, displacement_days)] = [row[1] for row in displacement_rows]
+    amplitude = np.full(epoch_days.shape, np.nan, dtype=np.float64)
+    amplitude[np.searchsorted(epoch_days, amplitude_days)] = [row[1] for row in amplitude_rows]
+    return TimeseriesColumns(epoch_days, displacement, amplitude)
+
+
+def unpack_columns(dates, displacement, amplitude) -> TimeseriesColumns:
+    # Packed arrays span every epoch of the track; epochs where the point has
+    # neither value are dropped to match the long-table result.
+    epoch_days = _epoch_days(dates)
+    displacement = np.array(displacement, dtype=np.float64)
+    amplitude = np.array(amplitude, dtype=np.float64)
+    keep = ~(np.isnan(displacement) & np.isnan(amplitude))
+    return TimeseriesColumns(epoch_days[keep], displacement[keep], amplitude[keep])
+
+
+async def fetch_timeseries_columns(
+    app: FastAPI,
+    area_id: str,
+    dataset_id: str,
+    code: str,
+    track: int,
+) -> TimeseriesColumns:
+    packed = await fetch_one(app, PACKED_COLUMN_QUERY, area_id, dataset_id, code, track)
+    if packed is not None:
+        return unpack_columns(packed["dates"], packed["displacement"], packed["amplitude"])
+
+    displacement_rows, amplitude_rows = await asyncio.gather(
+        fetch_all(app, DISPLACEMENT_COLUMN_QUERY, area_id, dataset_id, code, track),
+        fetch_all(app, AMPLITUDE_COLUMN_QUERY, area_id, dataset_id, code, track),
+    )
+    return merge_columns(displacement_rows, amplitude_rows)
+
+
+def _series_key(row) -> tuple[str, str, str, int]:
+    return row["area_id"], row["dataset_id"], row["code"], row["track"]
+
+
+def _key_arrays(keys) -> list[list]:
+    return [list(values) for values in zip(*keys)]
+
+
+def _group_rows(rows) -> dict[tuple[str, str, str, int], list]:
+    return {key: list(group) for key, group in groupby(rows, key=_series_key)}
+
+
+async def fetch_timeseries_batch(
+    app: FastAPI,
+    keys: list[tuple[str, str, str, int]],
+) -> dict[tuple[str, str, str, int], TimeseriesColumns]:
+    packed_rows = await fetch_all(app, PACKED_BATCH_QUERY, *_key_arrays(keys))
+    series = {
+        _series_key(row): unpack_columns(row["dates"], row["displacement"], row["amplitude"])
+        for row in packed_rows
+    }
+    unpacked = [key for key in keys if key not in series]
+    if unpacked:
+        key_arrays = _key_arrays(unpacked)
+        displacement_rows, amplitude_rows = await asyncio.gather(
+            fetch_all(app, DISPLACEMENT_BATCH_QUERY, *key_arrays),
+            fetch_all(app, AMPLITUDE_BATCH_QUERY, *key_arrays),
+        )
+        displacement_groups = _group_rows(displacement_rows)
+        amplitude_groups = _group_rows(amplitude_rows)
+        for key in unpacked:
+            if key in displacement_groups or key in amplitude_groups:
+                series[key] = merge_columns(
+                    displacement_groups.get(key, ()),
+                    amplitude_groups.get(key, ()),
+                )
+    return {key: series[key] for key in keys if key in series}
+
+
+def lttb_indices(x: np.ndarray, y: np.ndarray, max_points: int) -> np.ndarray:
+    # Largest-Triangle-Three-Buckets. Bucket averages and each bucket's triangle
+    # areas are computed with array ops; only the chain of selected points, which
+    # depends on the previous pick, walks the buckets in order.
+    n = len(x)
+    if max_points >= n or max_points < 3:
+        return np.arange(n)
+    edges = np.linspace(1, n - 1, max_points - 1).astype(np.intp)
+    counts = np.diff(edges)
+    avg_x = np.add.reduceat(x[: n - 1], edges[:-1]) / counts
+    avg_y = np.add.reduceat(y[: n - 1], edges[:-1]) / counts
+    next_x = np.append(avg_x[1:], x[-1])
+    next_y = np.append(avg_y[1:], y[-1])
+
+    selected = np.empty(max_points, dtype=np.intp)
+    selected[0] = 0
+    selected[-1] = n - 1
+    a = 0
+    for bucket in range(max_points - 2):
+        lo, hi = edges[bucket], edges[bucket + 1]
+        area = np.abs(
+            (x[a] - next_x[bucket]) * (y[lo:hi] - y[a])
+            - (x[a] - x[lo:hi]) * (next_y[bucket] - y[a])
+        )
+        a = lo + int(np.argmax(area))
+        selected[bucket + 1] = a
+    return selected
+
+
+def _series_indices(epoch_days: np.ndarray, series: np.ndarray, budget: int) -> np.ndarray:
+    valid = np.flatnonzero(np.isfinite(series))
+    if len(valid) <= budget:
+        return valid
+    x = epoch_days[valid].astype(np.float64)
+    y = series[valid].astype(np.float64)
+    # Two slots are held back for the largest epoch-to-epoch jump, which
+    # anomaly_local_v1 uses as the primary step; LTTB alone may split it.
+    keep = lttb_indices(x, y, budget - 2)
+    step = int(np.argmax(np.abs(np.diff(y))))
+    return valid[np.union1d(keep, (step, step + 1))]
+
+
+def downsample_indices(
+    epoch_days: np.ndarray,
+    displacement: np.ndarray,
+    amplitude: np.ndarray,
+    max_points: int,
+) -> np.ndarray:
+    if len(epoch_days) <= max_points:
+        return np.arange(len(epoch_days))
+    # Each series is reduced on its own epochs, so epochs that only carry an
+    # amplitude survive; the union stays within max_points.
+    present = [series for series in (displacement, amplitude) if np.isfinite(series).any()]
+    if not present:
+        return np.arange(0)
+    budget = max_points // len(present)
+    indices = [_series_indices(epoch_days, series, budget) for series in present]
+    return np.union1d(indices[0], indices[-1])
+
+
+def downsample_columns(columns: TimeseriesColumns, max_points: int) -> TimeseriesColumns:
+    indices = downsample_indices(
+        columns.epoch_days,
+        columns.displacement,
+        columns.amplitude,
+        max_points,
+    )
+    if len(indices) == len(columns):
+        return columns
+    return TimeseriesColumns(
+        columns.epoch_days[indices],
+        columns.displacement[indices],
+        columns.amplitude[indices],
+    )
+
+
+def downsample_rows(rows, max_points: int) -> list:
+    # Row-layout results are ordered by (dataset_id, track, date); each series
+    # is reduced on its own.
+    kept = []
+    for _, group in groupby(rows, key=lambda row: (row["dataset_id"], row["track"])):
+        group = list(group)
+        indices = downsample_indices(
+            _epoch_days([row["date"] for row in group]),
+            np.array([row["displacement"] for row in group], dtype=np.float64),
+            np.array([row["amplitude"] for row in group], dtype=np.float64),
+            max_points,
+        )
+        kept.extend(group[index] for index in indices)
+    return kept
+
+
+def columns_payload(columns: TimeseriesColumns) -> dict:
+    # NumPy arrays are serialized by orjson; NaN becomes null.
+    return {
+        "epoch_days": columns.epoch_days,
+        "displacement": columns.displacement,
+        "amplitude": columns.amplitude,
+    }
+
+
+def columns_bytes(columns: TimeseriesColumns) -> bytes:
+    return b"".join(
+        (
+            _COUNT.pack(len(columns)),
+            columns.epoch_days.astype("<i4").tobytes(),
+            columns.displacement.astype("<f4").tobytes(),
+            columns.amplitude.astype("<f4").tobytes(),
+        )
+    )
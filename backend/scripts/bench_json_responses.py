@@ -0,0 +1,99 @@
+from __future__ import annotations
+
+import argparse
+import json
+import sys
+import timeit
+from datetime import date, timedelta
+from pathlib import Path
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from app.responses import FastJSONResponse, model_response  # noqa: E402
+from app.schemas import InSARPointDetail, TimeseriesResponse  # noqa: E402
+
+
+def _timeseries_payload(measurements: int) -> dict:
+    start = date(2016, 1, 1)
+    return {
+        "area_id": "salzburg",
+        "dataset_id": "salzburg_snt",
+        "sensor": "S1",
+        "code": "A1B2C3",
+        "track": 44,
+        "measurements": [
+            {
+                "date": start + timedelta(days=6 * index),
+                "displacement": round(-0.137 * index + (index % 7) * 0.41, 3),
+                "amplitude": None if index % 11 == 0 else 0.5 + (index % 13) / 10,
+            }
+            for index in range(measurements)
+        ],
+    }
+
+
+def _point_detail() -> InSARPointDetail:
+    return InSARPointDetail(
+        area_id="salzburg",
+        dataset_id="salzburg_snt",
+        sensor="S1",
+        code="A1B2C3",
+        track=44,
+        los="ASC",
+        velocity=-3.21,
+        velocity_std=0.4,
+        coherence=0.87,
+        height=431.2,
+        geometry={"lon": 13.0437, "lat": 47.8095},
+        terrain={"source": "dgm", "resolution_m": 10.0, "slope_deg": 4.5},
+    )
+
+
+def _default_pipeline(model_type, content) -> bytes:
+    # What FastAPI does for a route with response_model: validate, encode, json.dumps.
+    validated = model_type.model_validate(content)
+    return JSONResponse(jsonable_encoder(validated)).body
+
+
+def _compare(label: str, baseline, fast, repeat: int) -> None:
+    baseline_body = baseline()
+    fast_body = fast()
+    if json.loads(baseline_body) != json.loads(fast_body):
+        raise SystemExit(f"{label}: fast path output differs from the default pipeline")
+    baseline_s = min(timeit.repeat(baseline, number=repeat, repeat=5)) / repeat
+    fast_s = min(timeit.repeat(fast, number=repeat, repeat=5)) / repeat
+    print(
+        f"{label:<28} default {baseline_s * 1e6:9.1f} us  "
+        f"fast {fast_s * 1e6:9.1f} us  speedup {baseline_s / fast_s:5.1f}x  "
+        f"({len(fast_body)} bytes, identical JSON)"
+    )
+
+
+def main(measurements: int, repeat: int) -> None:
+    payload = _timeseries_payload(measurements)
+    _compare(
+        f"timeseries ({measurements} rows)",
+        lambda: _default_pipeline(TimeseriesResponse, payload),
+        lambda: FastJSONResponse(payload).body,
+        repeat,
+    )
+    detail = _point_detail()
+    _compare(
+        "point detail",
+        lambda: _default_pipeline(InSARPointDetail, detail.model_dump()),
+        lambda: model_response(detail).body,
+        repeat * 20,
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Compare the default response pipeline with the orjson fast path."
+    )
+    parser.add_argument("--measurements", type=int, default=400)
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+    main(args.measurements, args.repeat)
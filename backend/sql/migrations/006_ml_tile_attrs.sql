@@ -0,0 +1,100 @@
+CREATE EXTENSION IF NOT EXISTS btree_gist;
+
+CREATE TABLE IF NOT EXISTS ml_point_tile_attrs (
+    run_id UUID NOT NULL,
+    area_id TEXT NOT NULL,
+    dataset_id TEXT NOT NULL,
+    code TEXT NOT NULL,
+    track INTEGER NOT NULL,
+    cluster_id TEXT,
+    building_source TEXT,
+    building_id TEXT,
+    distance_m DOUBLE PRECISION,
+    score DOUBLE PRECISION,
+    anomaly_score DOUBLE PRECISION,
+    quality_score DOUBLE PRECISION,
+    cross_track_consistency DOUBLE PRECISION,
+    label TEXT,
+    feature_set_version TEXT,
+    model_set_version TEXT,
+    velocity DOUBLE PRECISION,
+    coherence DOUBLE PRECISION,
+    method TEXT,
+    height_band TEXT,
+    degraded_reason TEXT,
+    cluster_role TEXT,
+    cluster_probability DOUBLE PRECISION,
+    cluster_outlier_score DOUBLE PRECISION,
+    is_main_cluster BOOLEAN NOT NULL DEFAULT false,
+    cluster_rank INTEGER,
+    gate_excluded BOOLEAN NOT NULL DEFAULT false,
+    kept_for_scoring BOOLEAN NOT NULL DEFAULT false,
+    building_track_point_count INTEGER,
+    kept_point_count_track INTEGER,
+    other_track_point_count INTEGER,
+    step_support DOUBLE PRECISION,
+    building_velocity_robust_z DOUBLE PRECISION,
+    building_motion_mm_a DOUBLE PRECISION,
+    building_reliability_score DOUBLE PRECISION,
+    building_reliability_band TEXT,
+    weak_secondary_track_flag BOOLEAN NOT NULL DEFAULT false,
+    agreement_tension_flag BOOLEAN NOT NULL DEFAULT false,
+    reliability_penalties_json TEXT NOT NULL DEFAULT '[]',
+    differential_motion_flag BOOLEAN NOT NULL DEFAULT false,
+    building_status TEXT,
+    track_agreement_score DOUBLE PRECISION,
+    building_cluster_count INTEGER,
+    reliable_cluster_count INTEGER,
+    neighbour_context_available BOOLEAN NOT NULL DEFAULT false,
+    neighbour_misassignment_flag BOOLEAN NOT NULL DEFAULT false,
+    neighbour_event_flag BOOLEAN NOT NULL DEFAULT false,
+    neighbour_event_score DOUBLE PRECISION,
+    supporting_neighbour_count INTEGER,
+    top_reason TEXT,
+    cluster_color_index INTEGER NOT NULL,
+    geom_3857 GEOMETRY(Point, 3857),
+    PRIMARY KEY (run_id, area_id, dataset_id, code, track)
+);
+
+CREATE TABLE IF NOT EXISTS ml_run_buildings (
+    run_id UUID NOT NULL,
+    area_id TEXT NOT NULL,
+    building_source TEXT NOT NULL,
+    building_id TEXT NOT NULL,
+    building_motion_mm_a DOUBLE PRECISION,
+    building_reliability_score DOUBLE PRECISION,
+    building_reliability_band TEXT,
+    weak_secondary_track_flag BOOLEAN NOT NULL DEFAULT false,
+    agreement_tension_flag BOOLEAN NOT NULL DEFAULT false,
+    reliability_penalties_json TEXT NOT NULL DEFAULT '[]',
+    differential_motion_flag BOOLEAN NOT NULL DEFAULT false,
+    building_status TEXT,
+    track_agreement_score DOUBLE PRECISION,
+    cluster_count INTEGER,
+    reliable_cluster_count INTEGER,
+    point_count INTEGER,
+    kept_point_count INTEGER,
+    noise_point_count INTEGER,
+    excluded_point_count INTEGER,
+    main_cluster_by_track_json TEXT NOT NULL DEFAULT '{}',
+    neighbour_context_available BOOLEAN NOT NULL DEFAULT false,
+    neighbour_candidate_building_count INTEGER,
+    neighbour_misassignment_point_count INTEGER,
+    neighbour_misassignment_share DOUBLE PRECISION,
+    neighbour_event_flag BOOLEAN NOT NULL DEFAULT false,
+    neighbour_event_score DOUBLE PRECISION,
+    neighbour_consistency_score DOUBLE PRECISION,
+    supporting_neighbour_count INTEGER,
+    supporting_track_count INTEGER,
+    height_m DOUBLE PRECISION,
+    color_index INTEGER,
+    geom_3857 GEOMETRY(MultiPolygon, 3857),
+    PRIMARY KEY (run_id, area_id, building_source, building_id)
+);
+
+-- Tile queries always filter on run_id, so the spatial indexes lead with it.
+CREATE INDEX IF NOT EXISTS ml_point_tile_attrs_run_geom_3857_idx
+    ON ml_point_tile_attrs USING GIST (run_id, geom_3857);
+
+CREATE INDEX IF NOT EXISTS ml_run_buildings_run_geom_3857_idx
+    ON ml_run_buildings USING GIST (run_id, geom_3857);
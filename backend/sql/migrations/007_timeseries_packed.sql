@@ -0,0 +1,20 @@
+CREATE TABLE IF NOT EXISTS insar_timeseries_dates (
+    area_id TEXT NOT NULL,
+    dataset_id TEXT NOT NULL,
+    track INTEGER NOT NULL,
+    dates DATE[] NOT NULL,
+    PRIMARY KEY (area_id, dataset_id, track)
+);
+
+CREATE TABLE IF NOT EXISTS insar_timeseries_packed (
+    area_id TEXT NOT NULL,
+    dataset_id TEXT NOT NULL,
+    code TEXT NOT NULL,
+    track INTEGER NOT NULL,
+    displacement DOUBLE PRECISION[] NOT NULL,
+    amplitude DOUBLE PRECISION[] NOT NULL,
+    PRIMARY KEY (area_id, dataset_id, code, track)
+);
+
+-- Fill both tables from the long timeseries tables:
+--   python pipeline/load_postgis.py --dsn ... --skip-schema --only pack-timeseries
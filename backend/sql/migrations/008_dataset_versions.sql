@@ -0,0 +1,5 @@
+CREATE TABLE IF NOT EXISTS dataset_versions (
+    name TEXT PRIMARY KEY,
+    version BIGINT NOT NULL,
+    updated_at TIMESTAMPTZ NOT NULL DEFAULT now()
+);
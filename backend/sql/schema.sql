@@ -1,17 +1,30 @@
 CREATE EXTENSION IF NOT EXISTS postgis;
+CREATE EXTENSION IF NOT EXISTS btree_gist;
 
 DROP TABLE IF EXISTS building_terrain_context;
 DROP TABLE IF EXISTS insar_point_terrain;
+DROP TABLE IF EXISTS insar_timeseries_packed;
+DROP TABLE IF EXISTS insar_timeseries_dates;
 DROP TABLE IF EXISTS insar_amplitude_timeseries;
 DROP TABLE IF EXISTS insar_timeseries;
 DROP TABLE IF EXISTS insar_points;
 DROP TABLE IF EXISTS gba_buildings;
 DROP TABLE IF EXISTS osm_buildings;
+DROP TABLE IF EXISTS ml_run_buildings;
+DROP TABLE IF EXISTS ml_point_tile_attrs;
 DROP TABLE IF EXISTS ml_building_colors;
 DROP TABLE IF EXISTS ml_run_metrics;
 DROP TABLE IF EXISTS ml_point_results;
 DROP TABLE IF EXISTS ml_runs;
 
+-- Bumped by the loaders after every reload; the API keys its detail cache on
+-- these versions. Not dropped above so versions keep increasing across reloads.
+CREATE TABLE IF NOT EXISTS dataset_versions (
+    name TEXT PRIMARY KEY,
+    version BIGINT NOT NULL,
+    updated_at TIMESTAMPTZ NOT NULL DEFAULT now()
+);
+
 CREATE TABLE insar_points (
     area_id TEXT NOT NULL,
     dataset_id TEXT NOT NULL,
@@ -67,6 +80,26 @@ CREATE TABLE insar_amplitude_timeseries (
 
 CREATE INDEX insar_amplitude_timeseries_code_idx ON insar_amplitude_timeseries (area_id, dataset_id, code, track);
 
+-- Packed copy of both timeseries tables: one date vector per track and one row
+-- per point whose arrays are aligned with it (NULL where an epoch is missing).
+CREATE TABLE insar_timeseries_dates (
+    area_id TEXT NOT NULL,
+    dataset_id TEXT NOT NULL,
+    track INTEGER NOT NULL,
+    dates DATE[] NOT NULL,
+    PRIMARY KEY (area_id, dataset_id, track)
+);
+
+CREATE TABLE insar_timeseries_packed (
+    area_id TEXT NOT NULL,
+    dataset_id TEXT NOT NULL,
+    code TEXT NOT NULL,
+    track INTEGER NOT NULL,
+    displacement DOUBLE PRECISION[] NOT NULL,
+    amplitude DOUBLE PRECISION[] NOT NULL,
+    PRIMARY KEY (area_id, dataset_id, code, track)
+);
+
 CREATE TABLE gba_buildings (
     area_id TEXT NOT NULL,
     gba_id TEXT NOT NULL,
@@ -193,3 +226,99 @@ CREATE TABLE ml_building_colors (
     PRIMARY KEY (run_id, area_id, building_source, building_id)
 );
 CREATE INDEX ml_building_colors_run_idx ON ml_building_colors (run_id);
+
+CREATE TABLE ml_point_tile_attrs (
+    run_id UUID NOT NULL,
+    area_id TEXT NOT NULL,
+    dataset_id TEXT NOT NULL,
+    code TEXT NOT NULL,
+    track INTEGER NOT NULL,
+    cluster_id TEXT,
+    building_source TEXT,
+    building_id TEXT,
+    distance_m DOUBLE PRECISION,
+    score DOUBLE PRECISION,
+    anomaly_score DOUBLE PRECISION,
+    quality_score DOUBLE PRECISION,
+    cross_track_consistency DOUBLE PRECISION,
+    label TEXT,
+    feature_set_version TEXT,
+    model_set_version TEXT,
+    velocity DOUBLE PRECISION,
+    coherence DOUBLE PRECISION,
+    method TEXT,
+    height_band TEXT,
+    degraded_reason TEXT,
+    cluster_role TEXT,
+    cluster_probability DOUBLE PRECISION,
+    cluster_outlier_score DOUBLE PRECISION,
+    is_main_cluster BOOLEAN NOT NULL DEFAULT false,
+    cluster_rank INTEGER,
+    gate_excluded BOOLEAN NOT NULL DEFAULT false,
+    kept_for_scoring BOOLEAN NOT NULL DEFAULT false,
+    building_track_point_count INTEGER,
+    kept_point_count_track INTEGER,
+    other_track_point_count INTEGER,
+    step_support DOUBLE PRECISION,
+    building_velocity_robust_z DOUBLE PRECISION,
+    building_motion_mm_a DOUBLE PRECISION,
+    building_reliability_score DOUBLE PRECISION,
+    building_reliability_band TEXT,
+    weak_secondary_track_flag BOOLEAN NOT NULL DEFAULT false,
+    agreement_tension_flag BOOLEAN NOT NULL DEFAULT false,
+    reliability_penalties_json TEXT NOT NULL DEFAULT '[]',
+    differential_motion_flag BOOLEAN NOT NULL DEFAULT false,
+    building_status TEXT,
+    track_agreement_score DOUBLE PRECISION,
+    building_cluster_count INTEGER,
+    reliable_cluster_count INTEGER,
+    neighbour_context_available BOOLEAN NOT NULL DEFAULT false,
+    neighbour_misassignment_flag BOOLEAN NOT NULL DEFAULT false,
+    neighbour_event_flag BOOLEAN NOT NULL DEFAULT false,
+    neighbour_event_score DOUBLE PRECISION,
+    supporting_neighbour_count INTEGER,
+    top_reason TEXT,
+    cluster_color_index INTEGER NOT NULL,
+    geom_3857 GEOMETRY(Point, 3857),
+    PRIMARY KEY (run_id, area_id, dataset_id, code, track)
+);
+
+CREATE INDEX ml_point_tile_attrs_run_geom_3857_idx ON ml_point_tile_attrs USING GIST (run_id, geom_3857);
+
+CREATE TABLE ml_run_buildings (
+    run_id UUID NOT NULL,
+    area_id TEXT NOT NULL,
+    building_source TEXT NOT NULL,
+    building_id TEXT NOT NULL,
+    building_motion_mm_a DOUBLE PRECISION,
+    building_reliability_score DOUBLE PRECISION,
+    building_reliability_band TEXT,
+    weak_secondary_track_flag BOOLEAN NOT NULL DEFAULT false,
+    agreement_tension_flag BOOLEAN NOT NULL DEFAULT false,
+    reliability_penalties_json TEXT NOT NULL DEFAULT '[]',
+    differential_motion_flag BOOLEAN NOT NULL DEFAULT false,
+    building_status TEXT,
+    track_agreement_score DOUBLE PRECISION,
+    cluster_count INTEGER,
+    reliable_cluster_count INTEGER,
+    point_count INTEGER,
+    kept_point_count INTEGER,
+    noise_point_count INTEGER,
+    excluded_point_count INTEGER,
+    main_cluster_by_track_json TEXT NOT NULL DEFAULT '{}',
+    neighbour_context_available BOOLEAN NOT NULL DEFAULT false,
+    neighbour_candidate_building_count INTEGER,
+    neighbour_misassignment_point_count INTEGER,
+    neighbour_misassignment_share DOUBLE PRECISION,
+    neighbour_event_flag BOOLEAN NOT NULL DEFAULT false,
+    neighbour_event_score DOUBLE PRECISION,
+    neighbour_consistency_score DOUBLE PRECISION,
+    supporting_neighbour_count INTEGER,
+    supporting_track_count INTEGER,
+    height_m DOUBLE PRECISION,
+    color_index INTEGER,
+    geom_3857 GEOMETRY(MultiPolygon, 3857),
+    PRIMARY KEY (run_id, area_id, building_source, building_id)
+);
+
+CREATE INDEX ml_run_buildings_run_geom_3857_idx ON ml_run_buildings USING GIST (run_id, geom_3857);
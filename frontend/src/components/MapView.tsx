@@ -885,7 +885,7 @@ export default function MapView() {
     addSourceIfMissing(map, "ml_points", {
       type: "vector",
       tiles: [
-        `${apiBase}/api/ml/runs/${activeRunId}/tiles/{z}/{x}/{y}.pbf?v=${mlTileVersion}&sv=${styleVersion}`,
+        `${apiBase}/api/ml/runs/${activeRunId}/tiles/{z}/{x}/{y}.pbf?profile=map&v=${mlTileVersion}&sv=${styleVersion}`,
       ],
       tileSize: 512,
       minzoom: 0,
@@ -895,7 +895,7 @@ export default function MapView() {
     addSourceIfMissing(map, "ml_buildings", {
       type: "vector",
       tiles: [
-        `${apiBase}/api/ml/runs/${activeRunId}/buildings/{z}/{x}/{y}.pbf?v=${mlTileVersion}&sv=${styleVersion}`,
+        `${apiBase}/api/ml/runs/${activeRunId}/buildings/{z}/{x}/{y}.pbf?profile=map&v=${mlTileVersion}&sv=${styleVersion}`,
       ],
       tileSize: 512,
       minzoom: 0,
@@ -1891,6 +1891,21 @@ export default function MapView() {
       `;
     } else if (feature.layer.id.startsWith("ml_buildings")) {
       html = formatMlBuildingTooltip(props, "ML Building");
+    } else if (feature.layer.id === "ml_points" && props.aggregated) {
+      html = `
+        <strong>ML Results (aggregated)</strong><br/>
+        Points: ${props.point_count ?? "—"}<br/>
+        Worst label: ${props.worst_label || "—"}<br/>
+        Normal / suspect / outlier: ${props.normal_count ?? 0} / ${props.suspect_count ?? 0} / ${
+          props.outlier_count ?? 0
+        }<br/>
+        Mean anomaly: ${
+          props.anomaly_score !== undefined && props.anomaly_score !== null
+            ? Number(props.anomaly_score).toFixed(2)
+            : "—"
+        }<br/>
+        Zoom in for individual points.
+      `;
     } else if (feature.layer.id === "ml_points") {
       html = `
         <strong>ML Result</strong><br/>
@@ -6,17 +6,7 @@ import { getPointTimeseries } from "../hooks/useApi";
 import { Badge, EmptyState, Switch } from "./ui";
 import { cn } from "@/lib/utils";
 
-type TimeseriesMeasurement = {
-  date: string;
-  displacement?: number | null;
-  amplitude?: number | null;
-};
-
-type TimeseriesResponse = {
-  code: string;
-  track?: number | null;
-  measurements?: TimeseriesMeasurement[];
-};
+const MS_PER_DAY = 86_400_000;
 
 function SeriesToggle({
   label,
@@ -70,26 +60,25 @@ export default function TimeseriesPanel() {
     ],
     queryFn: () =>
       pointSelection
-        ? (getPointTimeseries(
-            pointSelection.code,
-            {
-              track: pointSelection.track,
-              areaId: pointSelection.areaId,
-              datasetId: pointSelection.datasetId,
-            }
-          ) as Promise<TimeseriesResponse>)
+        ? getPointTimeseries(pointSelection.code, {
+            track: pointSelection.track,
+            areaId: pointSelection.areaId,
+            datasetId: pointSelection.datasetId,
+          })
         : Promise.resolve(null),
     enabled: Boolean(pointSelection),
   });
 
-  const measurements = tsQuery.data?.measurements ?? [];
-  const displacementData: Array<[string, number | null]> = measurements.map(
-    (measurement) => [measurement.date, measurement.displacement ?? null]
-  );
-  const amplitudeData: Array<[string, number | null]> = measurements.map(
-    (measurement) => [measurement.date, measurement.amplitude ?? null]
-  );
-  const hasMeasurements = measurements.length > 0;
+  const epochDays = tsQuery.data?.epoch_days ?? [];
+  const displacementData: Array<[number, number | null]> = epochDays.map((day, index) => [
+    day * MS_PER_DAY,
+    tsQuery.data?.displacement[index] ?? null,
+  ]);
+  const amplitudeData: Array<[number, number | null]> = epochDays.map((day, index) => [
+    day * MS_PER_DAY,
+    tsQuery.data?.amplitude[index] ?? null,
+  ]);
+  const hasMeasurements = epochDays.length > 0;
   const hasDisplacementData = displacementData.some(([, value]) => value !== null);
   const hasAmplitudeData = amplitudeData.some(([, value]) => value !== null);
 
@@ -380,9 +380,23 @@ export function getPointDetail(code: string, identity: PointIdentityQuery = {})
   return fetchJson<PointDetail>(`/api/points/${encodeURIComponent(code)}${query}`);
 }
 
+export type PointTimeseriesColumns = {
+  code: string;
+  track?: number | null;
+  epoch_days: number[];
+  displacement: Array<number | null>;
+  amplitude: Array<number | null>;
+};
+
+// Long TSX/PAZ stacks are reduced server-side (LTTB) to what the chart can show.
+const TIMESERIES_MAX_POINTS = 800;
+
 export function getPointTimeseries(code: string, identity: PointIdentityQuery = {}) {
   const query = buildPointQuery(identity);
-  return fetchJson(`/api/points/${encodeURIComponent(code)}/timeseries${query}`);
+  return fetchJson<PointTimeseriesColumns>(
+    `/api/points/${encodeURIComponent(code)}/timeseries${query}${query ? "&" : "?"}` +
+      `layout=columns&max_points=${TIMESERIES_MAX_POINTS}`
+  );
 }
 
 export function getBuildingDetail(source: "gba" | "osm", id: string, areaId: string) {
@@ -0,0 +1,34 @@
+from __future__ import annotations
+
+from sqlalchemy import text
+
+DATASET_VERSIONS_DDL = """
+    CREATE TABLE IF NOT EXISTS dataset_versions (
+        name TEXT PRIMARY KEY,
+        version BIGINT NOT NULL,
+        updated_at TIMESTAMPTZ NOT NULL DEFAULT now()
+    )
+"""
+
+BUMP_DATASET_VERSION_SQL = """
+    INSERT INTO dataset_versions (name, version)
+    VALUES (:name, 1)
+    ON CONFLICT (name) DO UPDATE
+    SET version = dataset_versions.version + 1,
+        updated_at = now()
+    RETURNING version
+"""
+
+
+def bump_dataset_versions(engine, names: list[str]) -> None:
+    # Running backends LISTEN on dataset_versions and drop cached detail
+    # responses for these tables once the NOTIFY arrives at commit.
+    with engine.begin() as conn:
+        conn.execute(text(DATASET_VERSIONS_DDL))
+        for name in names:
+            version = conn.execute(text(BUMP_DATASET_VERSION_SQL), {"name": name}).scalar_one()
+            conn.execute(
+                text("SELECT pg_notify('dataset_versions', :payload)"),
+                {"payload": f"{name}:{version}"},
+            )
+    print(f"  Bumped dataset versions: {', '.join(names)}")
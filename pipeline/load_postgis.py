@@ -11,6 +11,7 @@ from shapely.geometry import MultiPolygon, Polygon
 from sqlalchemy import create_engine, text
 
 from config import PARQUET_DIR
+from dataset_versions import bump_dataset_versions
 
 
 def _path_context(path: Path) -> tuple[str, str]:
@@ -202,6 +203,71 @@ def _load_amplitude_timeseries(engine, path: Path, area_id: str, dataset_id: str
     print()
 
 
+_PACK_SCOPE = "(:area_id = 'all' OR {alias}area_id = :area_id) AND (:dataset_id = 'all' OR {alias}dataset_id = :dataset_id)"
+
+PACK_TIMESERIES_STATEMENTS = [
+    f"DELETE FROM insar_timeseries_packed WHERE {_PACK_SCOPE.format(alias='')}",
+    f"DELETE FROM insar_timeseries_dates WHERE {_PACK_SCOPE.format(alias='')}",
+    f"""
+    INSERT INTO insar_timeseries_dates (area_id, dataset_id, track, dates)
+    SELECT area_id, dataset_id, track, array_agg(date ORDER BY date)
+    FROM (
+        SELECT area_id, dataset_id, track, date
+        FROM insar_timeseries
+        WHERE {_PACK_SCOPE.format(alias='')}
+        UNION
+        SELECT area_id, dataset_id, track, date
+        FROM insar_amplitude_timeseries
+        WHERE {_PACK_SCOPE.format(alias='')}
+    ) epochs
+    GROUP BY area_id, dataset_id, track
+    """,
+    f"""
+    INSERT INTO insar_timeseries_packed (area_id, dataset_id, code, track, displacement, amplitude)
+    SELECT p.area_id,
+           p.dataset_id,
+           p.code,
+           p.track,
+           array_agg(t.displacement ORDER BY e.ord),
+           array_agg(a.amplitude ORDER BY e.ord)
+    FROM insar_points p
+    JOIN insar_timeseries_dates v
+      ON v.area_id = p.area_id
+     AND v.dataset_id = p.dataset_id
+     AND v.track = p.track
+    CROSS JOIN LATERAL unnest(v.dates) WITH ORDINALITY AS e(date, ord)
+    LEFT JOIN insar_timeseries t
+      ON t.area_id = p.area_id
+     AND t.dataset_id = p.dataset_id
+     AND t.code = p.code
+     AND t.track = p.track
+     AND t.date = e.date
+    LEFT JOIN insar_amplitude_timeseries a
+      ON a.area_id = p.area_id
+     AND a.dataset_id = p.dataset_id
+     AND a.code = p.code
+     AND a.track = p.track
+     AND a.date = e.date
+    WHERE {_PACK_SCOPE.format(alias='p.')}
+    GROUP BY p.area_id, p.dataset_id, p.code, p.track
+    HAVING count(t.displacement) + count(a.amplitude) > 0
+    """,
+]
+
+
+def _pack_timeseries(engine, area_id: str, dataset_id: str) -> None:
+    # Rebuilds the packed tables from the long tables for the loaded scope.
+    print("  Packing timeseries into insar_timeseries_packed...")
+    with engine.begin() as conn:
+        for statement in PACK_TIMESERIES_STATEMENTS:
+            conn.execute(text(statement), {"area_id": area_id, "dataset_id": dataset_id})
+        packed = conn.execute(
+            text(f"SELECT count(*) FROM insar_timeseries_packed WHERE {_PACK_SCOPE.format(alias='')}"),
+            {"area_id": area_id, "dataset_id": dataset_id},
+        ).scalar_one()
+    print(f"    Packed {packed:,} point series")
+
+
 def _load_buildings(engine, path: Path, table: str, id_col: str, area_id: str) -> None:
     print(f"  Loading {path.relative_to(PARQUET_DIR)} -> {table}...")
     if not path.exists():
@@ -266,7 +332,7 @@ def main() -> None:
     )
     parser.add_argument(
         "--only",
-        choices=["all", "points", "timeseries", "buildings", "osm", "gba"],
+        choices=["all", "points", "timeseries", "pack-timeseries", "buildings", "osm", "gba"],
         default="all",
         help="Load only a specific dataset group",
     )
@@ -293,6 +359,17 @@ def main() -> None:
             for stmt in statements:
                 conn.execute(text(stmt))
         print("Schema created.")
+        bump_dataset_versions(
+            engine,
+            [
+                "insar_points",
+                "insar_timeseries",
+                "insar_point_terrain",
+                "building_terrain_context",
+                "gba_buildings",
+                "osm_buildings",
+            ],
+        )
 
     if args.schema_only:
         print("Skipping data load (--schema-only).")
@@ -309,6 +386,7 @@ def main() -> None:
             ),
             lambda path: _load_insar_points(engine, path, args.area_id, args.dataset_id),
         )
+        bump_dataset_versions(engine, ["insar_points"])
 
     if args.only in {"all", "timeseries"}:
         print("\nLoading timeseries...")
@@ -331,6 +409,11 @@ def main() -> None:
             lambda path: _load_amplitude_timeseries(engine, path, args.area_id, args.dataset_id),
         )
 
+    if args.only in {"all", "timeseries", "pack-timeseries"}:
+        print("\nPacking timeseries...")
+        _pack_timeseries(engine, args.area_id, args.dataset_id)
+        bump_dataset_versions(engine, ["insar_timeseries"])
+
     if args.only in {"all", "buildings", "gba"}:
         print("\nLoading GBA buildings...")
         _load_many(
@@ -338,6 +421,7 @@ def main() -> None:
             _discover_building_files("gba_buildings.parquet"),
             lambda path: _load_buildings(engine, path, "gba_buildings", "gba_id", args.area_id),
         )
+        bump_dataset_versions(engine, ["gba_buildings"])
     if args.only in {"all", "buildings", "osm"}:
         print("\nLoading OSM buildings...")
         _load_many(
@@ -345,6 +429,7 @@ def main() -> None:
             _discover_building_files("osm_buildings.parquet"),
             lambda path: _load_buildings(engine, path, "osm_buildings", "osm_id", args.area_id),
         )
+        bump_dataset_versions(engine, ["osm_buildings"])
 
     print("\nPostGIS load complete.")
 
@@ -8,6 +8,7 @@ import pandas as pd
 from sqlalchemy import create_engine, text
 
 from config import PARQUET_DIR
+from dataset_versions import bump_dataset_versions
 
 
 POINT_TERRAIN_PATH = PARQUET_DIR / "insar_point_terrain.parquet"
@@ -98,6 +99,7 @@ def main() -> None:
             "insar_point_terrain",
             ["area_id", "dataset_id", "code", "track"],
         )
+        bump_dataset_versions(engine, ["insar_point_terrain"])
 
     if not args.skip_buildings:
         if not BUILDING_TERRAIN_PATH.exists():
@@ -109,6 +111,7 @@ def main() -> None:
             "building_terrain_context",
             ["area_id", "building_source", "building_id"],
         )
+        bump_dataset_versions(engine, ["building_terrain_context"])
 
     print("Terrain context load complete.")
 